@@ -1,3 +1,12 @@
-from .client import ClientReadCallback, ClientWriter, ClientWriterStub, run_client
+from .client import (ClientReadCallback, ClientWriter, ClientWriterStub, StandbyConnections, read_trade_pairs_cache,
+                     run_client)
+from .common import ConnectionOptions
+from .eventlog import EventLog
 from .exceptions import *
-from .market_data_client import run as run_market_data
+from .history import MessageHistory
+from .instrumentation import StartupTimings, WireStats
+from .market_data_client import run as run_market_data, run_redundant as run_market_data_redundant
+from .order_book import OrderBookEvents
+from .runner import install_uvloop, run as run_main
+from .subscriptions import SubscriptionManager
+from .throttling import ThrottlingController
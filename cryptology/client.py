@@ -1,16 +1,23 @@
 import aiohttp
 import asyncio
+import collections
+import contextlib
 import functools
 import inspect
+import json
 import logging
+import os
 
 from datetime import datetime
-from typing import Any, AsyncIterator, Awaitable, Callable, ClassVar, Optional, Tuple, Type, cast, Dict, List
+from typing import Any, AsyncIterator, Awaitable, Callable, ClassVar, Deque, Optional, Tuple, Type, cast, Dict, List
 
-from . import common, exceptions, parallel
+from . import common, eventlog, exceptions, instrumentation, parallel
+from .history import MessageHistory
+from .throttling import ThrottlingController
 
 
-__all__ = ('ClientReadCallback', 'ClientWriter', 'ClientWriterStub', 'run_client',)
+__all__ = ('ClientReadCallback', 'ClientWriter', 'ClientWriterStub', 'StandbyConnections', 'run_client',
+           'read_trade_pairs_cache',)
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +27,8 @@ CLIENTWEBSOCKETRESPONSE_INIT_ARGS = list(
 
 
 class ClientWriterStub:
+    throttling: Optional[ThrottlingController] = None
+
     async def send_message(self, *, payload: dict) -> None:
         pass
 
@@ -36,6 +45,9 @@ class BaseProtocolClient(aiohttp.ClientWebSocketResponse):
     secret_key: ClassVar[str]
 
     sequence_id: int
+    wire_stats: Optional[instrumentation.WireStats]
+    event_log: Optional[eventlog.EventLog]
+    throttling: ThrottlingController
 
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         kw = {}
@@ -43,7 +55,9 @@ class BaseProtocolClient(aiohttp.ClientWebSocketResponse):
         kw.update(kwargs)
         super(BaseProtocolClient, self).__init__(**kw)
         self.send_fut = None
-        self.throttle = 0
+        self.throttling = ThrottlingController()
+        self.wire_stats = None
+        self.event_log = None
 
     async def authenticate(self, last_seen_message_id: int, get_balances: bool = False,
                            get_order_books: bool = False) -> Tuple[int, int, Dict, List[str]]:
@@ -82,29 +96,33 @@ class BaseProtocolClient(aiohttp.ClientWebSocketResponse):
                 'data': payload}
         if self.send_fut:
             await self.send_fut
-        if self.throttle:
-            logger.warning('throttle for %f seconds', self.throttle)
-            throttle, self.throttle = self.throttle, 0
-            await asyncio.sleep(throttle)
-        logger.debug('sending message with seq id %i: %s', sequence_id, payload)
+        await self.throttling.acquire()
+        if self.event_log is not None:
+            self.event_log.record('send', sequence_id, payload.get('@type'))
         self.send_fut = asyncio.ensure_future(self.send_json(data))
 
     async def receive_iter(self, throttling_callback: ClientThrottlingCallback) -> AsyncIterator[Tuple[datetime, dict]]:
         while True:
-            data = await common.receive_msg(self)
+            data = await common.receive_msg(self, wire_stats=self.wire_stats)
 
             message_type: common.ServerMessageType = common.ServerMessageType[data['response_type']]
-            logger.debug('message %s received', message_type)
             if message_type is common.ServerMessageType.THROTTLING:
                 level = data['overflow_level']
                 sequence_id = data['sequence_id']
+                if self.event_log is not None:
+                    self.event_log.record('throttling', sequence_id, level)
                 if not throttling_callback or not await throttling_callback(level, sequence_id):
-                    self.throttle = 0.001 * level
+                    self.throttling.on_throttling(level, sequence_id)
+                    logger.warning('throttling level %i, sending %.1f messages per second',
+                                   level, self.throttling.rate)
             elif message_type is common.ServerMessageType.MESSAGE:
                 ts = data['timestamp']
-                logger.debug('outbox message: %s', data['data'])
+                if self.event_log is not None:
+                    self.event_log.record('receive', data['message_id'], data['data'].get('@type'))
                 yield datetime.utcfromtimestamp(ts), data['message_id'], data['data']
             else:
+                if self.event_log is not None:
+                    self.event_log.record('unsupported', message_type.name)
                 logger.error('unsupported message type')
                 raise exceptions.UnsupportedMessageType()
 
@@ -122,8 +140,185 @@ def bind_response_class(access_key: str, secret_key: str) -> Type[BaseProtocolCl
 
 class CryptologyClientSession(aiohttp.ClientSession):
     def __init__(self, access_key: str, secret_key: str, *,
-                 loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
-        super().__init__(ws_response_class=bind_response_class(access_key, secret_key), loop=loop, conn_timeout=10)
+                 loop: Optional[asyncio.AbstractEventLoop] = None,
+                 trace_configs: Optional[List[aiohttp.TraceConfig]] = None,
+                 connector: Optional[aiohttp.BaseConnector] = None) -> None:
+        if loop is not None:
+            logger.warning('loop argument is deprecated')
+        super().__init__(ws_response_class=bind_response_class(access_key, secret_key),
+                         connector=connector,
+                         timeout=aiohttp.ClientTimeout(connect=10),
+                         trace_configs=trace_configs)
+
+
+def connect(session: CryptologyClientSession, ws_addr: str, connection_options: common.ConnectionOptions) -> Any:
+    return session.ws_connect(ws_addr, autoclose=True, autoping=True, receive_timeout=10, heartbeat=10,
+                              **common.ws_connect_kwargs(connection_options))
+
+
+class _Standby:
+    __slots__ = ('ws', 'connected_at', 'connect_time', 'watcher',)
+
+    ws: BaseProtocolClient
+    connected_at: float
+    connect_time: float
+    watcher: Optional[asyncio.Task]
+
+    def __init__(self, ws: BaseProtocolClient, connected_at: float, connect_time: float) -> None:
+        self.ws = ws
+        self.connected_at = connected_at
+        self.connect_time = connect_time
+        self.watcher = None
+
+
+class StandbyConnections:
+    """
+    keeps `size` connected but not authenticated sockets ready for `run_client`,
+    so that a restart skips DNS, TCP and TLS handshakes.
+    idle sockets are watched and replaced as soon as the server closes them,
+    sockets older than `max_idle` seconds are rotated.
+    use as an async context manager around the reconnect loop
+    """
+
+    def __init__(self, *, access_key: str, secret_key: str, ws_addr: str, size: int = 1,
+                 connection_options: common.ConnectionOptions = common.DEFAULT_CONNECTION_OPTIONS,
+                 retry_delay: float = 1., max_retry_delay: float = 60., max_idle: float = 60.) -> None:
+        if size < 1:
+            raise ValueError('size must be positive')
+        if max_idle <= 0:
+            raise ValueError('max_idle must be positive')
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.ws_addr = ws_addr
+        self.connection_options = connection_options
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_idle = max_idle
+        self._size = size
+        self._session: Optional[CryptologyClientSession] = None
+        self._idle: Deque[_Standby] = collections.deque()
+        self._changed: Optional[asyncio.Event] = None
+        self._closing = parallel.TaskGroup('standby close')
+        self._filler: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> 'StandbyConnections':
+        self._session = CryptologyClientSession(self.access_key, self.secret_key,
+                                                connector=common.make_connector(self.connection_options))
+        self._changed = asyncio.Event()
+        self._filler = asyncio.ensure_future(parallel.supervise(parallel.Child(
+            self._fill, name='standby connections', restart=parallel.Restart.ALWAYS,
+            restart_on=(aiohttp.ClientError, asyncio.TimeoutError, OSError), restart_delay=self.retry_delay,
+            backoff=2., max_restart_delay=self.max_retry_delay)))
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self._filler.cancel()
+        await asyncio.gather(self._filler, return_exceptions=True)
+        while self._idle:
+            self._discard(self._idle[0])
+        await self._closing.drain(1.)
+        await self._session.close()
+        self._session = self._changed = self._filler = None
+
+    @property
+    def ready(self) -> int:
+        return len(self._idle)
+
+    async def connect(self) -> BaseProtocolClient:
+        """
+        a new connection bypassing the standby sockets
+        """
+        if self._session is None:
+            raise RuntimeError('standby connections are not started')
+        ws = await connect(self._session, self.ws_addr, self.connection_options)
+        common.tune_socket(ws, self.connection_options)
+        return ws
+
+    async def _fill(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            expired = bool(self._idle) and self._idle[0].connected_at + self.max_idle <= loop.time()
+            if len(self._idle) < self._size or expired:
+                started = loop.time()
+                ws = await self.connect()
+                standby = _Standby(ws, loop.time(), loop.time() - started)
+                standby.watcher = asyncio.ensure_future(self._watch(standby))
+                self._idle.append(standby)
+                logger.info('standby connection to %s is ready', self.ws_addr)
+                while len(self._idle) > self._size:
+                    logger.info('rotating standby connection idle for %f seconds',
+                                loop.time() - self._idle[0].connected_at)
+                    self._discard(self._idle[0])
+                continue
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(),
+                                       self._idle[0].connected_at + self.max_idle - loop.time())
+            except asyncio.TimeoutError:
+                pass
+
+    async def _watch(self, standby: _Standby) -> None:
+        # nothing is expected on a socket which is not authenticated, any message ends it
+        while True:
+            try:
+                msg = await standby.ws.receive(timeout=self.max_idle)
+            except asyncio.TimeoutError:
+                continue
+            break
+        logger.info('standby connection was closed (%s %s)', msg.type.name, msg.data)
+        if standby in self._idle:
+            self._idle.remove(standby)
+            self._changed.set()
+        await standby.ws.close()
+
+    def _discard(self, standby: _Standby) -> None:
+        self._idle.remove(standby)
+        standby.watcher.cancel()
+        self._closing.spawn(standby.ws.close())
+
+    async def acquire(self, startup_timings: Optional[instrumentation.StartupTimings] = None) -> BaseProtocolClient:
+        """
+        returns a standby connection or connects right away when none is ready,
+        the time the standby connection took to open is added to `startup_timings` as `standby_connect`
+        """
+        if self._session is None:
+            raise RuntimeError('standby connections are not started')
+        while self._idle:
+            standby = self._idle.pop()
+            self._changed.set()
+            standby.watcher.cancel()
+            await asyncio.wait([standby.watcher])
+            if standby.watcher.cancelled() and not standby.ws.closed:
+                if startup_timings is not None:
+                    startup_timings.add('standby_connect', standby.connect_time)
+                return standby.ws
+            logger.info('standby connection was closed by the server')
+        logger.info('no standby connection is ready, connecting')
+        return await self.connect()
+
+
+def read_trade_pairs_cache(path: str) -> Optional[List[str]]:
+    """
+    trade pairs received on the last successful authentication,
+    available before connecting
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def update_trade_pairs_cache(path: str, pairs: List[str]) -> None:
+    if read_trade_pairs_cache(path) != pairs:
+        write_trade_pairs_cache(path, pairs)
+
+
+def write_trade_pairs_cache(path: str, pairs: List[str]) -> None:
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(pairs, f)
+    os.replace(tmp_path, path)
 
 
 async def run_client(*, access_key: str, secret_key: str, ws_addr: str,
@@ -133,25 +328,85 @@ async def run_client(*, access_key: str, secret_key: str, ws_addr: str,
                      loop: Optional[asyncio.AbstractEventLoop] = None,
                      get_balances: bool = False,
                      get_order_books: bool = False,
-                     error_callback: Any = None) -> None:
+                     error_callback: Any = None,
+                     connection_options: common.ConnectionOptions = common.DEFAULT_CONNECTION_OPTIONS,
+                     wire_stats: Optional[instrumentation.WireStats] = None,
+                     event_log: Optional[eventlog.EventLog] = None,
+                     callback_tasks: Optional[parallel.TaskGroup] = None,
+                     drain_timeout: float = 5.,
+                     standby: Optional[StandbyConnections] = None,
+                     startup_timings: Optional[instrumentation.StartupTimings] = None,
+                     trade_pairs_cache: Optional[str] = None,
+                     throttling_controller: Optional[ThrottlingController] = None,
+                     history: Optional[MessageHistory] = None) -> None:
     if error_callback:
         logger.warning('error_callback is deprecated')
-    async with CryptologyClientSession(access_key, secret_key, loop=loop) as session:
-        async with session.ws_connect(ws_addr, autoclose=True, autoping=True, receive_timeout=10, heartbeat=10) as ws:
+    if callback_tasks is None:
+        callback_tasks = parallel.TaskGroup('read_callback')
+    if startup_timings is None:
+        startup_timings = instrumentation.StartupTimings()
+    async with contextlib.AsyncExitStack() as stack:
+
+        async def authenticate(ws: BaseProtocolClient) -> Tuple[int, int, Dict, List[str]]:
+            if wire_stats is not None:
+                instrumentation.instrument(ws, wire_stats)
+                ws.wire_stats = wire_stats
+            ws.event_log = event_log
+            if throttling_controller is not None:
+                ws.throttling = throttling_controller
             logger.info('connected to the server %s', ws_addr)
-            sequence_id, server_version, state, pairs = await ws.authenticate(last_seen_message_id,
-                                                                              get_balances,
-                                                                              get_order_books)
-            logger.info('Authentication succeeded, server version %i, sequence id = %i', server_version, sequence_id)
-            if server_version < 6:
-                raise exceptions.IncompatibleVersion('Server version less than 6 is not supported')
-
-            async def reader_loop() -> None:
-                async for ts, message_id, msg in ws.receive_iter(throttling_callback):
-                    logger.debug('%s new msg from server @%i: %s', ts, message_id, msg)
-                    asyncio.ensure_future(read_callback(ws, ts, message_id, msg))
-
-            await parallel.run_parallel((
+            with startup_timings.measure('authenticate'):
+                return await ws.authenticate(last_seen_message_id, get_balances, get_order_books)
+
+        if standby is None:
+            with startup_timings.measure('session'):
+                session = await stack.enter_async_context(CryptologyClientSession(
+                    access_key, secret_key, loop=loop, trace_configs=[startup_timings.trace_config()],
+                    connector=common.make_connector(connection_options)))
+            with startup_timings.measure('connect'):
+                ws = await stack.enter_async_context(connect(session, ws_addr, connection_options))
+                common.tune_socket(ws, connection_options)
+            sequence_id, server_version, state, pairs = await authenticate(ws)
+        else:
+            if (standby.access_key, standby.secret_key, standby.ws_addr) != (access_key, secret_key, ws_addr):
+                raise ValueError('standby connections are bound to other credentials or address')
+            with startup_timings.measure('connect'):
+                ws = await stack.enter_async_context(await standby.acquire(startup_timings))
+            try:
+                sequence_id, server_version, state, pairs = await authenticate(ws)
+            except (exceptions.CryptologyConnectionError, aiohttp.ClientError, ConnectionError) as ex:
+                logger.warning('standby connection failed (%r), connecting', ex)
+                await ws.close()
+                with startup_timings.measure('connect'):
+                    ws = await stack.enter_async_context(await standby.connect())
+                sequence_id, server_version, state, pairs = await authenticate(ws)
+        logger.info('Authentication succeeded, server version %i, sequence id = %i', server_version, sequence_id)
+        logger.info('startup timings: %r', startup_timings)
+        if server_version < 6:
+            raise exceptions.IncompatibleVersion('Server version less than 6 is not supported')
+
+        async def reader_loop() -> None:
+            async for ts, message_id, msg in ws.receive_iter(throttling_callback):
+                if history is not None:
+                    history.append(message_id, ts, msg)
+                callback_tasks.spawn(read_callback(ws, ts, message_id, msg))
+
+        cache_update = None
+        if trade_pairs_cache is not None:
+            # written in background, the writer starts without waiting for the file
+            cache_update = asyncio.get_event_loop().run_in_executor(None, update_trade_pairs_cache,
+                                                                    trade_pairs_cache, pairs)
+        try:
+            await parallel.run_supervised((
                 reader_loop(),
                 writer(ws, pairs, state)
-            ), loop=loop)
+            ), tasks=callback_tasks, drain_timeout=drain_timeout)
+        except Exception:
+            if event_log is not None:
+                event_log.dump(logger)
+            raise
+        finally:
+            if cache_update is not None:
+                await asyncio.wait([cache_update])
+                if not cache_update.cancelled() and cache_update.exception() is not None:
+                    logger.warning('failed to write trade pairs cache', exc_info=cache_update.exception())
@@ -1,12 +1,15 @@
+import inspect
 import json
 import logging
+import socket
 from datetime import timedelta
 from enum import Enum, unique
-from typing import Any, Optional
+from typing import Any, Dict, NamedTuple, Optional, Tuple
 
 import aiohttp
 
 from . import exceptions
+from .instrumentation import WireStats
 
 
 logger = logging.getLogger(__name__)
@@ -18,6 +21,64 @@ CLOSE_MESSAGES = (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING,
                   aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR,)
 
 
+class ConnectionOptions(NamedTuple):
+    """
+    socket and websocket options of a connection.
+    buffer sizes are applied before the TCP handshake when aiohttp supports `socket_factory`,
+    with older aiohttp they are applied after it, when the TCP window scale is already
+    negotiated, so only shrinking the buffers is effective
+    """
+    tcp_nodelay: bool = True
+    receive_buffer_size: Optional[int] = None
+    send_buffer_size: Optional[int] = None
+    max_msg_size: int = 4 * 1024 * 1024
+    compress: int = 0
+
+
+DEFAULT_CONNECTION_OPTIONS = ConnectionOptions()
+
+
+def ws_connect_kwargs(options: ConnectionOptions) -> Dict[str, Any]:
+    return {'max_msg_size': options.max_msg_size, 'compress': options.compress}
+
+
+SOCKET_FACTORY_SUPPORTED = 'socket_factory' in inspect.signature(aiohttp.TCPConnector.__init__).parameters
+
+
+def set_buffer_sizes(sock: socket.socket, options: ConnectionOptions) -> None:
+    if options.receive_buffer_size:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, options.receive_buffer_size)
+    if options.send_buffer_size:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, options.send_buffer_size)
+
+
+def make_connector(options: ConnectionOptions) -> Optional[aiohttp.TCPConnector]:
+    """
+    connector setting buffer sizes on new sockets before they connect,
+    `None` (the default connector) when no buffer size is set or aiohttp has no `socket_factory`
+    """
+    if not SOCKET_FACTORY_SUPPORTED or not (options.receive_buffer_size or options.send_buffer_size):
+        return None
+
+    def socket_factory(addr_info: Tuple[Any, ...]) -> socket.socket:
+        family, type_, proto = addr_info[:3]
+        sock = socket.socket(family=family, type=type_, proto=proto)
+        set_buffer_sizes(sock, options)
+        return sock
+
+    return aiohttp.TCPConnector(socket_factory=socket_factory)
+
+
+def tune_socket(ws: aiohttp.ClientWebSocketResponse, options: ConnectionOptions) -> None:
+    sock = ws.get_extra_info('socket')
+    if sock is None:
+        logger.warning('socket is not available, connection options are not applied')
+        return
+    if sock.family in (socket.AF_INET, socket.AF_INET6):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, int(options.tcp_nodelay))
+    set_buffer_sizes(sock, options)
+
+
 class ByValue(Enum):
     @classmethod
     def by_value(cls, value: int) -> Any:
@@ -48,11 +109,15 @@ class ServerErrorType(ByValue):
     PERMISSION_DENIED = 3
 
 
-async def receive_msg(ws: aiohttp.ClientWebSocketResponse, *, timeout: Optional[float] = None) -> dict:
+async def receive_msg(ws: aiohttp.ClientWebSocketResponse, *, timeout: Optional[float] = None,
+                      wire_stats: Optional[WireStats] = None) -> dict:
     msg = await ws.receive(timeout=timeout)
     if msg.type in CLOSE_MESSAGES:
         logger.info('close msg received (type %s): %s', msg.type.name, msg.data)
         exceptions.handle_close_message(msg)
         raise exceptions.UnsupportedMessage(msg)
+    if wire_stats is not None:
+        data = msg.data
+        wire_stats.add_message(len(data.encode() if isinstance(data, str) else data))
 
     return json.loads(msg.data)
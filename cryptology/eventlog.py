@@ -0,0 +1,54 @@
+import collections
+import logging
+import time
+from typing import Any, Deque, List, Tuple
+
+__all__ = ('EventLog',)
+
+
+Event = Tuple[float, str, Tuple[Any, ...]]
+
+
+class EventLog:
+    """
+    in-memory ring buffer of the last `capacity` hot path events
+    only every `sample_every`-th event is kept, arguments are not formatted until `dump`.
+    the timestamp is taken at record time while arguments are kept by reference,
+    so record small immutable fields (ids, types) rather than payloads shared with callbacks.
+    pass `None` instead of an event log to disable recording entirely
+    """
+    __slots__ = ('sample_every', '_events', '_counter',)
+
+    sample_every: int
+    _events: Deque[Event]
+    _counter: int
+
+    def __init__(self, capacity: int = 4096, sample_every: int = 1) -> None:
+        if capacity < 1 or sample_every < 1:
+            raise ValueError('capacity and sample_every must be positive')
+        self.sample_every = sample_every
+        self._events = collections.deque(maxlen=capacity)
+        self._counter = 0
+
+    def record(self, event: str, *args: Any) -> None:
+        self._counter += 1
+        if self._counter % self.sample_every:
+            return
+        self._events.append((time.time(), event, args))
+
+    @property
+    def recorded(self) -> int:
+        return self._counter
+
+    def events(self) -> List[Event]:
+        return list(self._events)
+
+    def clear(self) -> None:
+        self._events.clear()
+
+    def dump(self, logger: logging.Logger, level: int = logging.ERROR) -> None:
+        if not logger.isEnabledFor(level):
+            return
+        lines = ['%.6f %s %s' % (ts, event, ' '.join(map(repr, args))) for ts, event, args in self._events]
+        logger.log(level, 'last %i of %i events (every %i recorded):\n%s',
+                   len(lines), self._counter, self.sample_every, '\n'.join(lines))
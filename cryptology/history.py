@@ -0,0 +1,256 @@
+import array
+import bisect
+import collections
+import json
+import logging
+import mmap
+import os
+import struct
+from datetime import datetime
+from typing import Deque, Dict, Iterator, List, NamedTuple, Optional
+
+__all__ = ('HistoryEntry', 'MessageHistory',)
+
+
+logger = logging.getLogger(__name__)
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class HistoryEntry(NamedTuple):
+    message_id: int
+    ts: datetime
+    payload: dict
+
+
+class SpillFile:
+    """
+    journal of messages in a memory-mapped circular file of fixed size,
+    a new record overwrites the oldest ones when the file is full, so append is O(1).
+    positions are logical byte offsets growing forever, the physical offset is taken modulo the capacity.
+    the journal survives restarts and is indexed by message id on open
+    """
+    HEADER = struct.Struct('<8sQQQ')
+    RECORD = struct.Struct('<qdI')
+    MAGIC = b'CRYPTHS2'
+    # dropped index entries are compacted in one slice deletion once there are this many
+    COMPACT_AFTER = 65536
+
+    def __init__(self, path: str, size: int) -> None:
+        if size < 1024:
+            raise ValueError('spill file size is too small')
+        exists = os.path.exists(path) and os.path.getsize(path) >= self.HEADER.size
+        self._file = open(path, 'r+b' if exists else 'w+b')
+        if not exists or os.path.getsize(path) < size:
+            self._file.truncate(size)
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        self.capacity = len(self._mmap) - self.HEADER.size
+        self.ids = array.array('q')
+        self.offsets = array.array('q')
+        self._first = 0
+        magic, capacity, start, end = self.HEADER.unpack_from(self._mmap, 0)
+        if magic != self.MAGIC or capacity != self.capacity:
+            start = end = 0
+        self.start = start
+        self.end = end
+        self._write_header()
+        self._scan()
+
+    def _write_header(self) -> None:
+        self.HEADER.pack_into(self._mmap, 0, self.MAGIC, self.capacity, self.start, self.end)
+
+    def _read_bytes(self, position: int, length: int) -> bytes:
+        offset = self.HEADER.size + position % self.capacity
+        head = min(length, len(self._mmap) - offset)
+        data = self._mmap[offset:offset + head]
+        if head < length:
+            data += self._mmap[self.HEADER.size:self.HEADER.size + length - head]
+        return data
+
+    def _write_bytes(self, position: int, data: bytes) -> None:
+        offset = self.HEADER.size + position % self.capacity
+        head = min(len(data), len(self._mmap) - offset)
+        self._mmap[offset:offset + head] = data[:head]
+        if head < len(data):
+            self._mmap[self.HEADER.size:self.HEADER.size + len(data) - head] = data[head:]
+
+    def _scan(self) -> None:
+        position = self.start
+        while position < self.end:
+            message_id, ts, length = self.RECORD.unpack(self._read_bytes(position, self.RECORD.size))
+            self.ids.append(message_id)
+            self.offsets.append(position)
+            position += self.RECORD.size + length
+
+    def __len__(self) -> int:
+        return len(self.ids) - self._first
+
+    @property
+    def first_id(self) -> Optional[int]:
+        return self.ids[self._first] if len(self) else None
+
+    @property
+    def last_id(self) -> Optional[int]:
+        return self.ids[-1] if len(self) else None
+
+    def append(self, message_id: int, ts: float, payload: dict) -> None:
+        if len(self) and message_id <= self.ids[-1]:
+            return
+        data = json.dumps(payload, separators=(',', ':')).encode()
+        record_size = self.RECORD.size + len(data)
+        if record_size > self.capacity:
+            logger.warning('message %i is too large for the spill file', message_id)
+            return
+        while self.end + record_size - self.start > self.capacity:
+            self._drop_oldest()
+        self._write_bytes(self.end, self.RECORD.pack(message_id, ts, len(data)) + data)
+        self.ids.append(message_id)
+        self.offsets.append(self.end)
+        self.end += record_size
+        self._write_header()
+
+    def _drop_oldest(self) -> None:
+        self._first += 1
+        self.start = self.offsets[self._first] if self._first < len(self.ids) else self.end
+        if self._first >= self.COMPACT_AFTER and self._first * 2 >= len(self.ids):
+            del self.ids[:self._first]
+            del self.offsets[:self._first]
+            self._first = 0
+
+    def _read(self, index: int) -> HistoryEntry:
+        position = self.offsets[index]
+        message_id, ts, length = self.RECORD.unpack(self._read_bytes(position, self.RECORD.size))
+        payload = json.loads(self._read_bytes(position + self.RECORD.size, length))
+        return HistoryEntry(message_id, datetime.utcfromtimestamp(ts), payload)
+
+    def get(self, message_id: int) -> Optional[HistoryEntry]:
+        index = bisect.bisect_left(self.ids, message_id, self._first)
+        if index < len(self.ids) and self.ids[index] == message_id:
+            return self._read(index)
+        return None
+
+    def range(self, start: int, stop: Optional[int] = None) -> Iterator[HistoryEntry]:
+        end = len(self.ids) if stop is None else bisect.bisect_left(self.ids, stop, self._first)
+        for index in range(bisect.bisect_left(self.ids, start, self._first), end):
+            yield self._read(index)
+
+    def flush(self) -> None:
+        self._mmap.flush()
+
+    def close(self) -> None:
+        self._mmap.close()
+        self._file.close()
+
+
+class MessageHistory:
+    """
+    last `capacity` private messages indexed by message id, `order_id` and `@type`.
+    with `spill_path` every message is also journaled to a memory-mapped file,
+    so lookups and ranges reach past the in-memory window and survive restarts.
+    message ids are expected to grow
+    """
+
+    def __init__(self, capacity: int = 100000, *, spill_path: Optional[str] = None,
+                 spill_size: int = 64 * 1024 * 1024) -> None:
+        if capacity < 1:
+            raise ValueError('capacity must be positive')
+        self.capacity = capacity
+        self._ring: List[Optional[HistoryEntry]] = [None] * capacity
+        self._head = 0
+        self._size = 0
+        self._by_id: Dict[int, HistoryEntry] = {}
+        self._by_order_id: Dict[int, Deque[HistoryEntry]] = {}
+        self._by_type: Dict[str, Deque[HistoryEntry]] = {}
+        self._spill = SpillFile(spill_path, spill_size) if spill_path is not None else None
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def last_message_id(self) -> Optional[int]:
+        if self._size:
+            return self._entry(self._size - 1).message_id
+        if self._spill is not None:
+            return self._spill.last_id
+        return None
+
+    def _entry(self, index: int) -> HistoryEntry:
+        return self._ring[(self._head + index) % self.capacity]
+
+    def append(self, message_id: int, ts: datetime, payload: dict) -> None:
+        if message_id in self._by_id:
+            return
+        entry = HistoryEntry(message_id, ts, payload)
+        if self._size == self.capacity:
+            self._evict(self._ring[self._head])
+            self._ring[self._head] = entry
+            self._head = (self._head + 1) % self.capacity
+        else:
+            self._ring[(self._head + self._size) % self.capacity] = entry
+            self._size += 1
+        self._by_id[message_id] = entry
+        order_id = payload.get('order_id')
+        if order_id is not None:
+            self._by_order_id.setdefault(order_id, collections.deque()).append(entry)
+        self._by_type.setdefault(payload.get('@type'), collections.deque()).append(entry)
+        if self._spill is not None:
+            self._spill.append(message_id, (ts - EPOCH).total_seconds(), payload)
+
+    def _evict(self, entry: HistoryEntry) -> None:
+        del self._by_id[entry.message_id]
+        order_id = entry.payload.get('order_id')
+        if order_id is not None:
+            entries = self._by_order_id[order_id]
+            entries.popleft()
+            if not entries:
+                del self._by_order_id[order_id]
+        entries = self._by_type[entry.payload.get('@type')]
+        entries.popleft()
+        if not entries:
+            del self._by_type[entry.payload.get('@type')]
+
+    def get(self, message_id: int) -> Optional[HistoryEntry]:
+        entry = self._by_id.get(message_id)
+        if entry is None and self._spill is not None:
+            return self._spill.get(message_id)
+        return entry
+
+    def _bisect(self, message_id: int) -> int:
+        low, high = 0, self._size
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(middle).message_id < message_id:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def range(self, start: int, stop: Optional[int] = None) -> Iterator[HistoryEntry]:
+        """
+        messages with `start <= message_id < stop` in order
+        """
+        first_in_memory = self._entry(0).message_id if self._size else None
+        if self._spill is not None and (first_in_memory is None or start < first_in_memory):
+            spill_stop = first_in_memory if stop is None else stop
+            if first_in_memory is not None:
+                spill_stop = min(spill_stop, first_in_memory)
+            yield from self._spill.range(start, spill_stop)
+        end = self._size if stop is None else self._bisect(stop)
+        for index in range(self._bisect(start), end):
+            yield self._entry(index)
+
+    def by_order_id(self, order_id: int) -> List[HistoryEntry]:
+        return list(self._by_order_id.get(order_id, ()))
+
+    def by_type(self, message_type: str) -> List[HistoryEntry]:
+        return list(self._by_type.get(message_type, ()))
+
+    def flush(self) -> None:
+        if self._spill is not None:
+            self._spill.flush()
+
+    def close(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
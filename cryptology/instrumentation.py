@@ -0,0 +1,135 @@
+import aiohttp
+import contextlib
+import logging
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator
+
+__all__ = ('StartupTimings', 'WireStats', 'instrument',)
+
+
+logger = logging.getLogger(__name__)
+
+
+class WireStats:
+    """
+    counters of a websocket connection:
+    bytes received from the socket versus UTF-8 bytes of decoded messages
+    and time spent in frame parsing (including inflate)
+    """
+    __slots__ = ('wire_bytes', 'decoded_bytes', 'messages', 'parse_time',)
+
+    wire_bytes: int
+    decoded_bytes: int
+    messages: int
+    parse_time: float
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self.messages = 0
+        self.parse_time = 0.
+
+    def add_message(self, size: int) -> None:
+        self.messages += 1
+        self.decoded_bytes += size
+
+    @property
+    def compression_ratio(self) -> float:
+        if not self.wire_bytes:
+            return 1.
+        return self.decoded_bytes / self.wire_bytes
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            'wire_bytes': self.wire_bytes,
+            'decoded_bytes': self.decoded_bytes,
+            'messages': self.messages,
+            'parse_time': self.parse_time,
+            'compression_ratio': self.compression_ratio,
+        }
+
+    def __repr__(self) -> str:
+        return (f'<WireStats wire_bytes={self.wire_bytes} decoded_bytes={self.decoded_bytes} '
+                f'messages={self.messages} parse_time={self.parse_time:.6f}>')
+
+
+def instrument(ws: aiohttp.ClientWebSocketResponse, stats: WireStats) -> bool:
+    """
+    count raw bytes and parse time of the connection underlying `ws`
+    decoded bytes are counted by `common.receive_msg`
+
+    aiohttp has no public hook for received bytes, so `data_received` of its protocol is wrapped.
+    only asyncio transports look the method up on every read, other transports (e.g. uvloop)
+    keep the original one, in that case nothing is wrapped and `False` is returned
+    """
+    protocol = ws._response.connection.protocol
+    transport = protocol.transport
+    if transport is None or not type(transport).__module__.startswith('asyncio.'):
+        logger.warning('wire bytes are not counted with %s transport', type(transport).__qualname__)
+        return False
+    data_received = protocol.data_received
+    perf_counter = time.perf_counter
+
+    def counting_data_received(data: bytes) -> None:
+        stats.wire_bytes += len(data)
+        started = perf_counter()
+        try:
+            data_received(data)
+        finally:
+            stats.parse_time += perf_counter() - started
+
+    protocol.data_received = counting_data_received
+    return True
+
+
+class StartupTimings:
+    """
+    seconds spent in each startup phase, in the order the phases finished
+    `dns` and `connection` (TCP and TLS including `dns`) come from `trace_config`.
+    a standby connection was opened in background without `trace_config`,
+    so there is no `dns` and `connection` then, `standby_connect` is the time it took to open
+    """
+    __slots__ = ('phases',)
+
+    phases: Dict[str, float]
+
+    def __init__(self) -> None:
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - started)
+
+    def add(self, phase: str, elapsed: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.) + elapsed
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        def start(phase: str):
+            async def on_start(session: aiohttp.ClientSession, context: SimpleNamespace, params: Any) -> None:
+                setattr(context, phase, time.perf_counter())
+            return on_start
+
+        def end(phase: str):
+            async def on_end(session: aiohttp.ClientSession, context: SimpleNamespace, params: Any) -> None:
+                self.add(phase, time.perf_counter() - getattr(context, phase))
+            return on_end
+
+        trace_config.on_dns_resolvehost_start.append(start('dns'))
+        trace_config.on_dns_resolvehost_end.append(end('dns'))
+        trace_config.on_connection_create_start.append(start('connection'))
+        trace_config.on_connection_create_end.append(end('connection'))
+        return trace_config
+
+    def __repr__(self) -> str:
+        phases = ' '.join(f'{phase}={elapsed:.6f}' for phase, elapsed in self.phases.items())
+        return f'<StartupTimings {phases}>'
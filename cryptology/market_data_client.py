@@ -1,17 +1,18 @@
 import aiohttp
 import asyncio
+import contextlib
+import functools
 import logging
-from typing import Optional, Callable, Awaitable, List
-import urllib
+from typing import Optional, AsyncIterator, Callable, Awaitable, Dict, List, Sequence, Tuple, Union
 from urllib.parse import urlencode
 from multidict import MultiDict
 
 
-from . import exceptions, common
+from . import eventlog, exceptions, common, instrumentation, parallel
 from datetime import datetime
 from decimal import Decimal
 
-__all__ = ('run',)
+__all__ = ('run', 'run_redundant', 'BroadcastDeduplicator',)
 
 
 logger = logging.getLogger(__name__)
@@ -21,34 +22,86 @@ MarketDataCallback = Callable[[dict], Awaitable[None]]
 OrderBookCallback = Callable[[int, str, dict, dict], Awaitable[None]]
 TradesCallback = Callable[[datetime, int, str, Decimal, Decimal], Awaitable[None]]
 
+BroadcastKey = Tuple[str, str]
+
+RECONNECT_ERRORS = (exceptions.CryptologyConnectionError, exceptions.RateLimit, aiohttp.ClientError,
+                    asyncio.TimeoutError,)
+RECONNECT_BACKOFF = 2.
+
+
+class BroadcastSource:
+    """
+    view of `BroadcastDeduplicator` for a single connection
+    counts repeated broadcasts with the same `current_order_id`
+    so that every occurrence is delivered exactly once
+    """
+    __slots__ = ('_delivered', '_seen',)
+
+    def __init__(self, delivered: Dict[BroadcastKey, Tuple[int, int]]) -> None:
+        self._delivered = delivered
+        self._seen: Dict[BroadcastKey, Tuple[int, int]] = {}
+
+    def is_new(self, payload: dict) -> bool:
+        key = payload['trade_pair'], payload['@type']
+        order_id = payload['current_order_id']
+        seen_id, seen_count = self._seen.get(key, (None, 0))
+        count = seen_count + 1 if seen_id == order_id else 1
+        self._seen[key] = order_id, count
+        delivered_id, delivered_count = self._delivered.get(key, (-1, 0))
+        if order_id > delivered_id or (order_id == delivered_id and count > delivered_count):
+            self._delivered[key] = order_id, count
+            return True
+        return False
+
+
+class BroadcastDeduplicator:
+    """
+    drops broadcasts already delivered by another connection,
+    relies on `current_order_id` growing within a trade pair
+    """
+    def __init__(self) -> None:
+        self._delivered: Dict[BroadcastKey, Tuple[int, int]] = {}
+
+    def source(self) -> BroadcastSource:
+        return BroadcastSource(self._delivered)
+
 
 async def reader_loop(
         ws: aiohttp.ClientWebSocketResponse,
         market_data_callback: MarketDataCallback,
         order_book_callback: OrderBookCallback,
-        trades_callback: TradesCallback) -> None:
-    logger.info(f'broadcast connection established')
+        trades_callback: TradesCallback,
+        wire_stats: Optional[instrumentation.WireStats] = None,
+        source: Optional[BroadcastSource] = None,
+        event_log: Optional[eventlog.EventLog] = None,
+        tasks: Optional[parallel.TaskGroup] = None) -> None:
+    logger.info('broadcast connection established')
+    spawn = tasks.spawn if tasks is not None else asyncio.ensure_future
     while True:
-        msg = await common.receive_msg(ws)
+        msg = await common.receive_msg(ws, wire_stats=wire_stats)
 
         try:
             message_type: common.ServerMessageType = common.ServerMessageType[msg['response_type']]
             if message_type != common.ServerMessageType.BROADCAST:
                 raise exceptions.UnsupportedMessageType()
             payload = msg['data']
+            if event_log is not None:
+                event_log.record('broadcast', payload['@type'], payload['trade_pair'], payload['current_order_id'])
+            if source is not None and not source.is_new(payload):
+                continue
             if market_data_callback is not None:
                 await market_data_callback(payload)
             if payload['@type'] == 'OrderBookAgg':
                 if order_book_callback is not None:
-                    asyncio.ensure_future(order_book_callback(
+                    spawn(order_book_callback(
                         payload['current_order_id'],
                         payload['trade_pair'],
-                        payload.get('buy_levels', dict),
-                        payload.get('sell_levels', dict)
+                        payload.get('buy_levels', {}),
+                        payload.get('sell_levels', {})
                     ))
             elif payload['@type'] == 'AnonymousTrade':
                 if trades_callback is not None:
-                    asyncio.ensure_future(trades_callback(
+                    spawn(trades_callback(
                         datetime.utcfromtimestamp(payload['time'][0]),
                         payload['current_order_id'],
                         payload['trade_pair'],
@@ -58,21 +111,112 @@ async def reader_loop(
             else:
                 raise exceptions.UnsupportedMessageType()
         except (KeyError, ValueError, exceptions.UnsupportedMessageType):
-            logger.exception('failed to decode data')
+            logger.exception('failed to decode data: %r', msg)
             raise exceptions.CryptologyError('failed to decode data')
 
 
+def build_url(ws_addr: str, trade_pairs: Optional[List[str]]) -> str:
+    if not trade_pairs:
+        return ws_addr
+    params = MultiDict()
+    for trade_pair in trade_pairs:
+        params.add('trade_pair', trade_pair)
+    return '{}?{}'.format(ws_addr, urlencode(params))
+
+
+@contextlib.asynccontextmanager
+async def connect(session: aiohttp.ClientSession, url: str, connection_options: common.ConnectionOptions,
+                  wire_stats: Optional[instrumentation.WireStats] = None
+                  ) -> AsyncIterator[aiohttp.ClientWebSocketResponse]:
+    async with session.ws_connect(url, receive_timeout=20, heartbeat=8,
+                                  **common.ws_connect_kwargs(connection_options)) as ws:
+        common.tune_socket(ws, connection_options)
+        if wire_stats is not None:
+            instrumentation.instrument(ws, wire_stats)
+        yield ws
+
+
 async def run(*, ws_addr: str, market_data_callback: MarketDataCallback = None,
               order_book_callback: OrderBookCallback = None,
               trades_callback: TradesCallback = None,
               trade_pairs: List[str] = None,
-              loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
-    url = ws_addr
-    if trade_pairs:
-        params = MultiDict()
-        for trade_pair in trade_pairs:
-            params.add('trade_pair', trade_pair)
-        url = '{}?{}'.format(url, urlencode(params))
-    async with aiohttp.ClientSession(loop=loop) as session:
-        async with session.ws_connect(url, receive_timeout=20, heartbeat=8) as ws:
-            await reader_loop(ws, market_data_callback, order_book_callback, trades_callback)
+              loop: Optional[asyncio.AbstractEventLoop] = None,
+              connection_options: common.ConnectionOptions = common.DEFAULT_CONNECTION_OPTIONS,
+              wire_stats: Optional[instrumentation.WireStats] = None,
+              event_log: Optional[eventlog.EventLog] = None,
+              callback_tasks: Optional[parallel.TaskGroup] = None,
+              drain_timeout: float = 5.) -> None:
+    if loop is not None:
+        logger.warning('loop argument is deprecated')
+    if callback_tasks is None:
+        callback_tasks = parallel.TaskGroup('market_data_callback')
+    url = build_url(ws_addr, trade_pairs)
+    try:
+        async with aiohttp.ClientSession(connector=common.make_connector(connection_options)) as session:
+            async with connect(session, url, connection_options, wire_stats) as ws:
+                try:
+                    await reader_loop(ws, market_data_callback, order_book_callback, trades_callback, wire_stats,
+                                      event_log=event_log, tasks=callback_tasks)
+                finally:
+                    await callback_tasks.drain(drain_timeout)
+    except Exception:
+        if event_log is not None:
+            event_log.dump(logger)
+        raise
+
+
+async def run_redundant(*, ws_addr: Union[str, Sequence[str]],
+                        connections: Optional[int] = None,
+                        market_data_callback: MarketDataCallback = None,
+                        order_book_callback: OrderBookCallback = None,
+                        trades_callback: TradesCallback = None,
+                        trade_pairs: List[str] = None,
+                        connection_options: common.ConnectionOptions = common.DEFAULT_CONNECTION_OPTIONS,
+                        wire_stats: Optional[instrumentation.WireStats] = None,
+                        event_log: Optional[eventlog.EventLog] = None,
+                        callback_tasks: Optional[parallel.TaskGroup] = None,
+                        drain_timeout: float = 5.,
+                        reconnect_delay: float = 1.,
+                        max_reconnect_delay: float = 60.) -> None:
+    """
+    keep several connections subscribed to the same broadcasts,
+    deliver every broadcast once from whichever connection receives it first
+    and reconnect lost connections in background,
+    the delay doubles on each failed attempt up to `max_reconnect_delay`
+    `ws_addr` may list several servers, one connection per address,
+    otherwise `connections` (2 by default) connections are made to `ws_addr`
+    """
+    if isinstance(ws_addr, str):
+        addrs = [ws_addr] * (connections if connections is not None else 2)
+    else:
+        addrs = list(ws_addr)
+        if connections is not None and connections != len(addrs):
+            raise ValueError('connections must match the number of addresses')
+    if not addrs:
+        raise ValueError('at least one connection is required')
+    if callback_tasks is None:
+        callback_tasks = parallel.TaskGroup('market_data_callback')
+    deduplicator = BroadcastDeduplicator()
+
+    async def connection_loop(session: aiohttp.ClientSession, number: int, url: str) -> None:
+        async with connect(session, url, connection_options, wire_stats) as ws:
+            logger.info('redundant connection %i established', number)
+            await reader_loop(ws, market_data_callback, order_book_callback, trades_callback, wire_stats,
+                              deduplicator.source(), event_log, callback_tasks)
+
+    try:
+        async with aiohttp.ClientSession(connector=common.make_connector(connection_options)) as session:
+            await parallel.run_supervised(
+                (parallel.Child(functools.partial(connection_loop, session, number, build_url(addr, trade_pairs)),
+                                name=f'redundant connection {number}',
+                                restart=parallel.Restart.ALWAYS,
+                                restart_on=RECONNECT_ERRORS,
+                                restart_delay=reconnect_delay,
+                                backoff=RECONNECT_BACKOFF,
+                                max_restart_delay=max_reconnect_delay)
+                 for number, addr in enumerate(addrs)),
+                tasks=callback_tasks, drain_timeout=drain_timeout)
+    except Exception:
+        if event_log is not None:
+            event_log.dump(logger)
+        raise
@@ -0,0 +1,97 @@
+import heapq
+from decimal import Decimal
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+__all__ = ('Level', 'OrderBookDiffer', 'OrderBookEvents',)
+
+
+Level = Tuple[str, str]
+Levels = Dict[str, str]
+LevelDeltas = Dict[str, Optional[str]]
+
+TopOfBookCallback = Callable[[int, str, Optional[Level], Optional[Level]], Awaitable[None]]
+LevelDeltaCallback = Callable[[int, str, LevelDeltas, LevelDeltas], Awaitable[None]]
+
+
+def top_levels(levels: Levels, depth: int, best: Callable) -> Tuple[Levels, Optional[Level]]:
+    """
+    the best `depth` levels (always a new dict) and the best level found in the same pass
+    """
+    if not levels:
+        return {}, None
+    if depth == 1:
+        price = best(levels, key=Decimal)
+        return {price: levels[price]}, (price, levels[price])
+    if len(levels) <= depth:
+        price = best(levels, key=Decimal)
+        return dict(levels), (price, levels[price])
+    nbest = heapq.nlargest if best is max else heapq.nsmallest
+    prices = nbest(depth, levels, key=Decimal)
+    return {price: levels[price] for price in prices}, (prices[0], levels[prices[0]])
+
+
+def level_deltas(previous: Levels, current: Levels) -> LevelDeltas:
+    deltas: LevelDeltas = {price: amount for price, amount in current.items() if previous.get(price) != amount}
+    for price in previous.keys() - current.keys():
+        deltas[price] = None
+    return deltas
+
+
+class OrderBookDiffer:
+    """
+    keeps the best `depth` levels of each side per trade pair
+    and diffs them against the next aggregated snapshot.
+    deltas map price to the new amount or to `None` when the level left the depth of interest
+    """
+    __slots__ = ('depth', '_books', '_best',)
+
+    def __init__(self, depth: int = 1) -> None:
+        if depth < 1:
+            raise ValueError('depth must be positive')
+        self.depth = depth
+        self._books: Dict[str, Tuple[Levels, Levels]] = {}
+        self._best: Dict[str, Tuple[Optional[Level], Optional[Level]]] = {}
+
+    def update(self, trade_pair: str, buy_levels: Levels, sell_levels: Levels) -> Tuple[LevelDeltas, LevelDeltas]:
+        buy, bid = top_levels(buy_levels, self.depth, max)
+        sell, ask = top_levels(sell_levels, self.depth, min)
+        previous_buy, previous_sell = self._books.get(trade_pair, ({}, {}))
+        self._books[trade_pair] = buy, sell
+        self._best[trade_pair] = bid, ask
+        return level_deltas(previous_buy, buy), level_deltas(previous_sell, sell)
+
+    def best(self, trade_pair: str) -> Tuple[Optional[Level], Optional[Level]]:
+        """
+        best bid and ask of the last snapshot, found by `update`
+        """
+        return self._best.get(trade_pair, (None, None))
+
+    def forget(self, trade_pair: str) -> None:
+        self._books.pop(trade_pair, None)
+        self._best.pop(trade_pair, None)
+
+
+class OrderBookEvents:
+    """
+    `OrderBookCallback` that calls `top_of_book_callback` only when the best bid or ask
+    (price or amount) changes and `level_delta_callback` only when any of the best `depth` levels changes
+    """
+
+    def __init__(self, *, top_of_book_callback: TopOfBookCallback = None,
+                 level_delta_callback: LevelDeltaCallback = None,
+                 depth: int = 1) -> None:
+        self.top_of_book_callback = top_of_book_callback
+        self.level_delta_callback = level_delta_callback
+        self.differ = OrderBookDiffer(depth)
+
+    async def __call__(self, order_id: int, trade_pair: str, buy_levels: Levels, sell_levels: Levels) -> None:
+        previous_bid, previous_ask = self.differ.best(trade_pair)
+        buy_deltas, sell_deltas = self.differ.update(trade_pair, buy_levels, sell_levels)
+        if not buy_deltas and not sell_deltas:
+            return
+        if self.top_of_book_callback is not None:
+            bid, ask = self.differ.best(trade_pair)
+            if bid != previous_bid or ask != previous_ask:
+                await self.top_of_book_callback(order_id, trade_pair, bid, ask)
+        if self.level_delta_callback is not None:
+            await self.level_delta_callback(order_id, trade_pair, buy_deltas, sell_deltas)
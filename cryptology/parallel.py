@@ -1,7 +1,12 @@
 import asyncio
-from typing import Awaitable, Iterable, Optional
+import logging
+from enum import Enum, unique
+from typing import Awaitable, Callable, Dict, Iterable, NamedTuple, Optional, Set, Tuple, Type, Union
 
-__all__ = ('run_parallel',)
+__all__ = ('run_parallel', 'run_supervised', 'supervise', 'Child', 'Restart', 'TaskGroup',)
+
+
+logger = logging.getLogger(__name__)
 
 
 async def run_parallel(coros: Iterable[Awaitable[None]],
@@ -13,7 +18,9 @@ async def run_parallel(coros: Iterable[Awaitable[None]],
     raises first non-canceled exception
     may raise `asyncio.CanceledError` when `raise_canceled` is set
     """
-    tasks = list(asyncio.Task(x, loop=loop) for x in coros)
+    if loop is not None:
+        logger.warning('loop argument is deprecated')
+    tasks = list(asyncio.ensure_future(x) for x in coros)
 
     if not tasks:
         return
@@ -28,7 +35,7 @@ async def run_parallel(coros: Iterable[Awaitable[None]],
     for task in tasks:
         task.add_done_callback(cancel_others)
 
-    result = await asyncio.gather(*tasks, return_exceptions=True, loop=loop)
+    result = await asyncio.gather(*tasks, return_exceptions=True)
 
     exception = None
     for err in filter(None, result):
@@ -42,3 +49,157 @@ async def run_parallel(coros: Iterable[Awaitable[None]],
 
     if exception is not None:
         raise exception
+
+
+class TaskGroup:
+    """
+    tracks fire-and-forget tasks such as read callbacks
+    failed tasks are logged and counted instead of being lost,
+    `drain` waits for pending tasks up to a deadline and cancels the rest.
+    `cancelled` counts tasks cancelled from outside, tasks cancelled by `drain` are `leaked`
+    """
+    __slots__ = ('name', 'max_pending', '_tasks', 'spawned', 'failed', 'cancelled', 'leaked', 'overruns',
+                 'peak_pending',)
+
+    def __init__(self, name: str = 'tasks', *, max_pending: int = 0) -> None:
+        self.name = name
+        self.max_pending = max_pending
+        self._tasks: Set[asyncio.Future] = set()
+        self.spawned = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.leaked = 0
+        self.overruns = 0
+        self.peak_pending = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def spawn(self, coro: Awaitable[None]) -> asyncio.Future:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+        self.spawned += 1
+        pending = len(self._tasks)
+        if pending > self.peak_pending:
+            self.peak_pending = pending
+        if self.max_pending and pending > self.max_pending:
+            if not self.overruns:
+                logger.warning('%s: %i tasks pending, limit is %i', self.name, pending, self.max_pending)
+            self.overruns += 1
+        return task
+
+    def _done(self, task: asyncio.Future) -> None:
+        self._tasks.discard(task)
+        if task.cancelled():
+            self.cancelled += 1
+            return
+        self._check_failure(task)
+
+    def _check_failure(self, task: asyncio.Future) -> None:
+        exception = task.exception()
+        if exception is not None:
+            self.failed += 1
+            logger.error('%s: task failed', self.name, exc_info=exception)
+
+    async def drain(self, timeout: Optional[float] = None) -> int:
+        """
+        wait for pending tasks up to `timeout` seconds, cancel the rest
+        returns the number of cancelled tasks, they are counted as `leaked`, not `cancelled`
+        """
+        if not self._tasks:
+            return 0
+        done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.remove_done_callback(self._done)
+            task.cancel()
+        if pending:
+            self.leaked += len(pending)
+            logger.warning('%s: %i tasks not finished in %s seconds, cancelled', self.name, len(pending), timeout)
+            await asyncio.wait(pending)
+            for task in pending:
+                self._tasks.discard(task)
+                if not task.cancelled():
+                    self._check_failure(task)
+        return len(pending)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'pending': self.pending,
+            'spawned': self.spawned,
+            'failed': self.failed,
+            'cancelled': self.cancelled,
+            'leaked': self.leaked,
+            'overruns': self.overruns,
+            'peak_pending': self.peak_pending,
+        }
+
+
+@unique
+class Restart(Enum):
+    NEVER = 'never'
+    ON_FAILURE = 'on_failure'
+    ALWAYS = 'always'
+
+
+class Child(NamedTuple):
+    factory: Callable[[], Awaitable[None]]
+    name: str = 'child'
+    restart: Restart = Restart.NEVER
+    restart_on: Tuple[Type[Exception], ...] = (Exception,)
+    max_restarts: Optional[int] = None
+    restart_delay: float = 1.
+    backoff: float = 1.
+    max_restart_delay: float = 60.
+    reset_after: float = 60.
+
+
+async def supervise(child: Child) -> None:
+    """
+    run `child.factory()` and restart it according to `child.restart`
+    exceptions not listed in `child.restart_on` are never restarted
+    the delay is multiplied by `child.backoff` on each restart up to `child.max_restart_delay`
+    and returns to `child.restart_delay` after the child ran for `child.reset_after` seconds
+    """
+    loop = asyncio.get_event_loop()
+    restarts = 0
+    delay = child.restart_delay
+    while True:
+        started = loop.time()
+        try:
+            await child.factory()
+        except child.restart_on as ex:
+            if child.restart is Restart.NEVER or restarts == child.max_restarts:
+                raise
+            failure: Optional[Exception] = ex
+        else:
+            if child.restart is not Restart.ALWAYS or restarts == child.max_restarts:
+                return
+            failure = None
+        if loop.time() - started >= child.reset_after:
+            delay = child.restart_delay
+        if failure is not None:
+            logger.warning('%s failed, restarting in %f seconds: %r', child.name, delay, failure)
+        else:
+            logger.info('%s finished, restarting in %f seconds', child.name, delay)
+        restarts += 1
+        await asyncio.sleep(delay)
+        delay = min(delay * child.backoff, child.max_restart_delay)
+
+
+async def run_supervised(children: Iterable[Union[Child, Awaitable[None]]],
+                         *,
+                         tasks: Optional[TaskGroup] = None,
+                         drain_timeout: Optional[float] = 5.,
+                         raise_canceled: bool = False) -> None:
+    """
+    `run_parallel` over supervised children,
+    on exit drains `tasks` spawned by the children within `drain_timeout` seconds
+    """
+    try:
+        await run_parallel((supervise(x) if isinstance(x, Child) else x for x in children),
+                           raise_canceled=raise_canceled)
+    finally:
+        if tasks is not None:
+            await tasks.drain(drain_timeout)
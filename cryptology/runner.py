@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from typing import Awaitable, TypeVar
+
+__all__ = ('install_uvloop', 'new_event_loop', 'run', 'run_in_loop',)
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+def install_uvloop() -> bool:
+    """
+    set uvloop event loop policy when uvloop is installed
+    returns `True` on success
+    """
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning('uvloop is not installed, falling back to the default event loop')
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.info('uvloop event loop policy installed')
+    return True
+
+
+def new_event_loop(use_uvloop: bool = False) -> asyncio.AbstractEventLoop:
+    """
+    a new uvloop event loop when `use_uvloop` is set and uvloop is installed,
+    the default event loop otherwise. the event loop policy is left unchanged
+    """
+    if use_uvloop:
+        try:
+            import uvloop
+        except ImportError:
+            logger.warning('uvloop is not installed, falling back to the default event loop')
+        else:
+            return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
+def run(main: Awaitable[T], *, use_uvloop: bool = False, debug: bool = False) -> T:
+    """
+    run `main` in a new event loop and close the loop on exit
+    with `use_uvloop` the loop is a uvloop one when uvloop is installed
+    """
+    loop = new_event_loop(use_uvloop)
+    loop.set_debug(debug)
+    return run_in_loop(loop, main)
+
+
+def run_in_loop(loop: asyncio.AbstractEventLoop, main: Awaitable[T]) -> T:
+    """
+    run `main` in `loop` as the current event loop,
+    then cancel leftover tasks, shut down async generators and close the loop
+    """
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(main)
+    finally:
+        try:
+            pending = [task for task in asyncio.all_tasks(loop) if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
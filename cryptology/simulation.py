@@ -0,0 +1,270 @@
+import aiohttp
+import asyncio
+import itertools
+import json
+import logging
+import selectors
+from datetime import datetime
+from typing import Awaitable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
+
+from . import common, exceptions, market_data_client, parallel, runner
+from .client import ClientReadCallback, ClientWriter, ClientWriterStub
+from .market_data_client import MarketDataCallback, OrderBookCallback, TradesCallback
+
+__all__ = ('SimulatedWriter', 'SimulationEventLoop', 'VirtualClock', 'client_messages', 'read_recording',
+           'replay_client', 'replay_market_data', 'simulate',)
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+RecordedMessage = Tuple[float, Union[str, dict]]
+ClientMessage = Tuple[float, int, dict]
+
+
+class VirtualClock:
+    """
+    time of `SimulationEventLoop` in seconds since epoch
+    """
+    __slots__ = ('now',)
+
+    def __init__(self, start: float = 0.) -> None:
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance_to(self, ts: float) -> None:
+        if ts > self.now:
+            self.now = ts
+
+    @property
+    def datetime(self) -> datetime:
+        return datetime.utcfromtimestamp(self.now)
+
+
+class VirtualSelector(selectors.DefaultSelector):
+    def __init__(self, clock: VirtualClock) -> None:
+        super().__init__()
+        self._clock = clock
+
+    def select(self, timeout: Optional[float] = None) -> List[Tuple[selectors.SelectorKey, int]]:
+        ready = super().select(0)
+        if ready or timeout is not None and timeout <= 0:
+            return ready
+        if timeout is None:
+            return super().select(None)
+        self._clock.now += timeout
+        return []
+
+
+class SimulationEventLoop(asyncio.SelectorEventLoop):
+    """
+    event loop running on `VirtualClock`:
+    when nothing is ready the clock jumps to the next timer instead of waiting
+    """
+
+    def __init__(self, clock: Optional[VirtualClock] = None) -> None:
+        self.clock = clock if clock is not None else VirtualClock()
+        super().__init__(VirtualSelector(self.clock))
+        # timers due exactly at the virtual time must run, the float resolution of epoch seconds is ~1e-7
+        self._clock_resolution = 1e-5
+
+    def time(self) -> float:
+        return self.clock.now
+
+
+def simulate(main: Awaitable[T], *, clock: Optional[VirtualClock] = None) -> T:
+    """
+    run `main` in a new `SimulationEventLoop` and close the loop on exit
+    """
+    return runner.run_in_loop(SimulationEventLoop(clock), main)
+
+
+def message_time(message: dict, default: float) -> float:
+    data = message.get('data', message)
+    if 'time' in data:
+        return float(data['time'][0])
+    if 'timestamp' in message:
+        return float(message['timestamp'])
+    return default
+
+
+def read_recording(path: str) -> Iterator[RecordedMessage]:
+    """
+    messages of a JSON lines recording with the time each one is replayed at:
+    `ts` of the line when present, otherwise the trade or message time,
+    otherwise the time of the previous message
+    """
+    ts = 0.
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            message = json.loads(line)
+            ts = float(message.pop('ts', None) or message_time(message, ts))
+            yield ts, message
+
+
+def client_messages(messages: Iterable[Union[RecordedMessage, ClientMessage]]) -> Iterator[ClientMessage]:
+    """
+    `(ts, message_id, payload)` of the MESSAGE frames of a recording,
+    THROTTLING frames are skipped, already decoded messages are passed through
+    """
+    for message in messages:
+        if len(message) == 3:
+            yield message
+            continue
+        ts, frame = message
+        if isinstance(frame, str):
+            frame = json.loads(frame)
+        message_type = common.ServerMessageType[frame['response_type']]
+        if message_type is common.ServerMessageType.THROTTLING:
+            continue
+        if message_type is not common.ServerMessageType.MESSAGE:
+            raise exceptions.UnsupportedMessageType()
+        yield ts, frame['message_id'], frame['data']
+
+
+def start_clock(ts: float) -> None:
+    """
+    a virtual clock which was not started jumps to the first replayed message
+    """
+    loop = asyncio.get_event_loop()
+    if isinstance(loop, SimulationEventLoop) and loop.clock.now == 0.:
+        loop.clock.advance_to(ts)
+
+
+async def sleep_until(ts: float) -> None:
+    start_clock(ts)
+    loop = asyncio.get_event_loop()
+    delay = ts - loop.time()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+class _EndOfRecording(Exception):
+    pass
+
+
+class ReplayWebSocket:
+    def __init__(self, messages: Iterable[RecordedMessage]) -> None:
+        self._messages = iter(messages)
+
+    async def receive(self, timeout: Optional[float] = None) -> aiohttp.WSMessage:
+        try:
+            ts, message = next(self._messages)
+        except StopIteration:
+            raise _EndOfRecording()
+        await sleep_until(ts)
+        if not isinstance(message, str):
+            message = json.dumps(message)
+        return aiohttp.WSMessage(aiohttp.WSMsgType.TEXT, message, None)
+
+
+async def replay_market_data(messages: Iterable[RecordedMessage], *,
+                             market_data_callback: MarketDataCallback = None,
+                             order_book_callback: OrderBookCallback = None,
+                             trades_callback: TradesCallback = None,
+                             callback_tasks: Optional[parallel.TaskGroup] = None,
+                             drain_timeout: Optional[float] = None) -> None:
+    """
+    feed recorded broadcasts to the `run_market_data` callbacks at their recorded time
+    """
+    if callback_tasks is None:
+        callback_tasks = parallel.TaskGroup('market_data_callback')
+    try:
+        await market_data_client.reader_loop(ReplayWebSocket(messages), market_data_callback, order_book_callback,
+                                             trades_callback, tasks=callback_tasks)
+    except _EndOfRecording:
+        pass
+    finally:
+        await callback_tasks.drain(drain_timeout)
+
+
+class SimulatedWriter(ClientWriterStub):
+    """
+    `ClientWriterStub` acknowledging order placement and cancellation after `latency` seconds,
+    orders are never matched.
+    responses get negative message ids, so they never collide with recorded messages
+    """
+
+    def __init__(self, read_callback: ClientReadCallback, tasks: parallel.TaskGroup, *,
+                 latency: float = 0.001, first_order_id: int = 1) -> None:
+        self.read_callback = read_callback
+        self.latency = latency
+        self._message_ids = itertools.count(-1, -1)
+        self.sent: List[Tuple[datetime, dict]] = []
+        self.open_orders: Dict[int, dict] = {}
+        self._tasks = tasks
+        self._order_ids = itertools.count(first_order_id)
+
+    async def send_message(self, *, payload: dict) -> None:
+        loop = asyncio.get_event_loop()
+        self.sent.append((datetime.utcfromtimestamp(loop.time()), payload))
+        response = self.respond(payload)
+        if response is not None:
+            loop.call_later(self.latency, self._deliver, response)
+
+    def respond(self, payload: dict) -> Optional[dict]:
+        message_type = payload.get('@type')
+        if message_type in ('PlaceBuyLimitOrder', 'PlaceSellLimitOrder'):
+            side = 'Buy' if message_type == 'PlaceBuyLimitOrder' else 'Sell'
+            order = {
+                '@type': f'{side}OrderPlaced',
+                'order_id': next(self._order_ids),
+                'trade_pair': payload['trade_pair'],
+                'price': payload['price'],
+                'amount': payload['amount'],
+                'client_order_id': payload.get('client_order_id', 0),
+            }
+            self.open_orders[order['order_id']] = order
+            return order
+        if message_type == 'CancelOrder':
+            order = self.open_orders.pop(payload['order_id'], None)
+            if order is None:
+                return None
+            return {
+                '@type': order['@type'].replace('Placed', 'Cancelled'),
+                'order_id': order['order_id'],
+                'trade_pair': order['trade_pair'],
+                'client_order_id': order['client_order_id'],
+            }
+        logger.debug('%s is not simulated', message_type)
+        return None
+
+    def _deliver(self, payload: dict) -> None:
+        ts = datetime.utcfromtimestamp(asyncio.get_event_loop().time())
+        self._tasks.spawn(self.read_callback(self, ts, next(self._message_ids), payload))
+
+
+async def replay_client(messages: Iterable[Union[RecordedMessage, ClientMessage]], *,
+                        read_callback: ClientReadCallback, writer: ClientWriter,
+                        pairs: Iterable[str] = (), state: Optional[Dict] = None,
+                        latency: float = 0.001,
+                        callback_tasks: Optional[parallel.TaskGroup] = None,
+                        drain_timeout: Optional[float] = None) -> SimulatedWriter:
+    """
+    drive `run_client` callbacks from `(ts, message_id, payload)` messages or `read_recording` frames,
+    the writer gets a `SimulatedWriter`, the session ends when the recording or the writer ends
+    """
+    if callback_tasks is None:
+        callback_tasks = parallel.TaskGroup('read_callback')
+    ws = SimulatedWriter(read_callback, callback_tasks, latency=latency)
+    messages = client_messages(messages)
+    first = next(messages, None)
+    if first is not None:
+        start_clock(first[0])
+        messages = itertools.chain([first], messages)
+
+    async def reader_loop() -> None:
+        for ts, message_id, payload in messages:
+            await sleep_until(ts)
+            callback_tasks.spawn(read_callback(ws, datetime.utcfromtimestamp(ts), message_id, payload))
+
+    await parallel.run_supervised((
+        reader_loop(),
+        writer(ws, list(pairs), state)
+    ), tasks=callback_tasks, drain_timeout=drain_timeout)
+    return ws
@@ -0,0 +1,226 @@
+import aiohttp
+import asyncio
+import functools
+import logging
+from typing import FrozenSet, Iterable, List, Optional, Set
+
+from . import common, eventlog, instrumentation, market_data_client, parallel
+from .market_data_client import MarketDataCallback, OrderBookCallback, TradesCallback
+
+__all__ = ('SubscriptionManager',)
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Shard:
+    __slots__ = ('pairs', 'task', 'receiving',)
+
+    pairs: FrozenSet[str]
+    task: Optional[asyncio.Task]
+    receiving: Optional[asyncio.Event]
+
+    def __init__(self, pairs: FrozenSet[str]) -> None:
+        self.pairs = pairs
+        self.task = None
+        self.receiving = None
+
+    def __repr__(self) -> str:
+        return f'<Shard {",".join(sorted(self.pairs))}>'
+
+
+class _ShardSource:
+    __slots__ = ('_source', '_receiving', '_pairs',)
+
+    def __init__(self, source: market_data_client.BroadcastSource, receiving: asyncio.Event,
+                 pairs: Set[str]) -> None:
+        self._source = source
+        self._receiving = receiving
+        self._pairs = pairs
+
+    def is_new(self, payload: dict) -> bool:
+        self._receiving.set()
+        if payload['trade_pair'] not in self._pairs:
+            return False
+        return self._source.is_new(payload)
+
+
+class SubscriptionManager:
+    """
+    market data subscription to a changing set of trade pairs
+
+    pairs are spread over a pool of connections with at most `pairs_per_connection` pairs each.
+    a connection is replaced make-before-break: the old one is closed only after
+    the new one starts receiving broadcasts, duplicates are dropped by `BroadcastDeduplicator`,
+    so pairs which are not changed never miss an update.
+    removed pairs are filtered out at once and their connections are compacted by `rebalance`
+    """
+
+    def __init__(self, *, ws_addr: str,
+                 trade_pairs: Iterable[str] = (),
+                 market_data_callback: MarketDataCallback = None,
+                 order_book_callback: OrderBookCallback = None,
+                 trades_callback: TradesCallback = None,
+                 pairs_per_connection: int = 8,
+                 connection_options: common.ConnectionOptions = common.DEFAULT_CONNECTION_OPTIONS,
+                 wire_stats: Optional[instrumentation.WireStats] = None,
+                 event_log: Optional[eventlog.EventLog] = None,
+                 callback_tasks: Optional[parallel.TaskGroup] = None,
+                 reconnect_delay: float = 1.,
+                 max_reconnect_delay: float = 60.,
+                 switch_timeout: float = 5.,
+                 drain_timeout: float = 5.) -> None:
+        if pairs_per_connection < 1:
+            raise ValueError('pairs_per_connection must be positive')
+        self.ws_addr = ws_addr
+        self.market_data_callback = market_data_callback
+        self.order_book_callback = order_book_callback
+        self.trades_callback = trades_callback
+        self.pairs_per_connection = pairs_per_connection
+        self.connection_options = connection_options
+        self.wire_stats = wire_stats
+        self.event_log = event_log
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.switch_timeout = switch_timeout
+        self.drain_timeout = drain_timeout
+        if callback_tasks is None:
+            callback_tasks = parallel.TaskGroup('market_data_callback')
+        self.callback_tasks = callback_tasks
+        self._deduplicator = market_data_client.BroadcastDeduplicator()
+        self._pairs: Set[str] = set()
+        self._shards: List[_Shard] = []
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._switches = parallel.TaskGroup('subscription switch')
+        self._retired: Set[asyncio.Task] = set()
+        self._failed: Optional[asyncio.Future] = None
+        self.add(*trade_pairs)
+
+    @property
+    def pairs(self) -> FrozenSet[str]:
+        return frozenset(self._pairs)
+
+    @property
+    def connections(self) -> List[FrozenSet[str]]:
+        return [shard.pairs for shard in self._shards]
+
+    def add(self, *pairs: str) -> None:
+        new = [x for x in dict.fromkeys(pairs) if x not in self._pairs]
+        self._pairs.update(new)
+        streamed = set().union(*(shard.pairs for shard in self._shards))
+        new = [x for x in new if x not in streamed]
+        while new:
+            free = [x for x in self._shards if len(x.pairs) < self.pairs_per_connection]
+            if free:
+                shard = min(free, key=lambda x: len(x.pairs))
+                room = self.pairs_per_connection - len(shard.pairs)
+                chunk, new = new[:room], new[room:]
+                self._replace([shard], shard.pairs.union(chunk))
+            else:
+                chunk, new = new[:self.pairs_per_connection], new[self.pairs_per_connection:]
+                self._replace([], frozenset(chunk))
+
+    def remove(self, *pairs: str) -> None:
+        self._pairs.difference_update(pairs)
+        for shard in list(self._shards):
+            if not shard.pairs & self._pairs:
+                self._retire(shard)
+
+    def rebalance(self) -> None:
+        """
+        drop removed pairs from connections and merge underfilled connections
+        """
+        for shard in list(self._shards):
+            if not shard.pairs <= self._pairs:
+                self._replace([shard], shard.pairs & self._pairs)
+        shards = sorted(self._shards, key=lambda x: len(x.pairs))
+        while len(shards) > 1 and len(shards[0].pairs) + len(shards[1].pairs) <= self.pairs_per_connection:
+            merged = self._replace(shards[:2], shards[0].pairs | shards[1].pairs)
+            shards = sorted(shards[2:] + [merged], key=lambda x: len(x.pairs))
+
+    async def run(self) -> None:
+        if self._session is not None:
+            raise RuntimeError('subscription manager is already running')
+        self._failed = asyncio.get_event_loop().create_future()
+        async with aiohttp.ClientSession(connector=common.make_connector(self.connection_options)) as session:
+            self._session = session
+            try:
+                for shard in self._shards:
+                    self._start(shard)
+                await self._failed
+            except Exception:
+                if self.event_log is not None:
+                    self.event_log.dump(logger)
+                raise
+            finally:
+                self._session = None
+                await self._switches.drain(0)
+                tasks = [x.task for x in self._shards if x.task is not None] + list(self._retired)
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                for shard in self._shards:
+                    shard.task = None
+                await self.callback_tasks.drain(self.drain_timeout)
+
+    def _replace(self, old: List[_Shard], pairs: FrozenSet[str]) -> _Shard:
+        shard = _Shard(pairs)
+        self._shards.append(shard)
+        logger.info('subscribing %r instead of %r', shard, old)
+        if self._session is None:
+            for x in old:
+                self._shards.remove(x)
+            return shard
+        self._start(shard)
+        for x in old:
+            self._shards.remove(x)
+            self._switches.spawn(self._retire_after(x, shard))
+        return shard
+
+    def _retire(self, shard: _Shard) -> None:
+        logger.info('unsubscribing %r', shard)
+        self._shards.remove(shard)
+        self._stop(shard)
+
+    def _stop(self, shard: _Shard) -> None:
+        # stopped connections are awaited by `run` before the session is closed
+        if shard.task is not None:
+            shard.task.cancel()
+            self._retired.add(shard.task)
+            shard.task.add_done_callback(self._retired.discard)
+
+    async def _retire_after(self, old: _Shard, new: _Shard) -> None:
+        try:
+            await asyncio.wait_for(new.receiving.wait(), self.switch_timeout)
+        except asyncio.TimeoutError:
+            logger.warning('%r is silent for %f seconds, closing %r anyway', new, self.switch_timeout, old)
+        finally:
+            self._stop(old)
+
+    def _start(self, shard: _Shard) -> None:
+        shard.receiving = asyncio.Event()
+        shard.task = asyncio.ensure_future(parallel.supervise(parallel.Child(
+            functools.partial(self._connect, shard),
+            name=repr(shard),
+            restart=parallel.Restart.ALWAYS,
+            restart_on=market_data_client.RECONNECT_ERRORS,
+            restart_delay=self.reconnect_delay,
+            backoff=market_data_client.RECONNECT_BACKOFF,
+            max_restart_delay=self.max_reconnect_delay)))
+        shard.task.add_done_callback(self._check_failure)
+
+    def _check_failure(self, task: asyncio.Task) -> None:
+        if task.cancelled() or self._failed is None or self._failed.done():
+            return
+        exception = task.exception()
+        if exception is not None:
+            self._failed.set_exception(exception)
+
+    async def _connect(self, shard: _Shard) -> None:
+        url = market_data_client.build_url(self.ws_addr, sorted(shard.pairs))
+        shard.receiving.clear()
+        async with market_data_client.connect(self._session, url, self.connection_options, self.wire_stats) as ws:
+            await market_data_client.reader_loop(
+                ws, self.market_data_callback, self.order_book_callback, self.trades_callback, self.wire_stats,
+                source=_ShardSource(self._deduplicator.source(), shard.receiving, self._pairs),
+                event_log=self.event_log, tasks=self.callback_tasks)
@@ -0,0 +1,110 @@
+import asyncio
+import math
+import time
+from typing import Callable, Dict, Optional
+
+__all__ = ('ThrottlingController',)
+
+
+class ThrottlingController:
+    """
+    paces outgoing messages according to the history of THROTTLING frames
+
+    the overflow level rises at once to the reported level and decays
+    with `half_life` seconds, every message is spaced by
+    `1 / max_rate + level_scale * level` seconds, up to `burst` messages may go back to back.
+    a THROTTLING frame for a sequence id older than the last one reported is stale and ignored
+    """
+    __slots__ = ('max_rate', 'level_scale', 'half_life', 'burst', 'clock', 'throttled', 'stale', 'sent', 'waited',
+                 '_level', '_level_at', '_available_at', '_sequence_id',)
+
+    def __init__(self, *, max_rate: Optional[float] = None, level_scale: float = 0.001, half_life: float = 5.,
+                 burst: int = 1, clock: Callable[[], float] = time.monotonic) -> None:
+        if max_rate is not None and max_rate <= 0:
+            raise ValueError('max_rate must be positive')
+        if half_life <= 0 or burst < 1:
+            raise ValueError('half_life and burst must be positive')
+        self.max_rate = max_rate
+        self.level_scale = level_scale
+        self.half_life = half_life
+        self.burst = burst
+        self.clock = clock
+        self.throttled = 0
+        self.stale = 0
+        self.sent = 0
+        self.waited = 0.
+        self._level = 0.
+        self._level_at = clock()
+        self._available_at = -math.inf
+        self._sequence_id: Optional[int] = None
+
+    def on_throttling(self, level: int, sequence_id: Optional[int] = None) -> None:
+        if sequence_id is not None:
+            if self._sequence_id is not None and sequence_id < self._sequence_id:
+                self.stale += 1
+                return
+            self._sequence_id = sequence_id
+        now = self.clock()
+        self._level = max(self._decayed_level(now), float(level))
+        self._level_at = now
+        self.throttled += 1
+
+    def _decayed_level(self, now: float) -> float:
+        if not self._level:
+            return 0.
+        return self._level * 0.5 ** ((now - self._level_at) / self.half_life)
+
+    @property
+    def level(self) -> float:
+        return self._decayed_level(self.clock())
+
+    def interval(self) -> float:
+        base = 1. / self.max_rate if self.max_rate else 0.
+        return base + self.level_scale * self.level
+
+    @property
+    def rate(self) -> float:
+        """
+        current allowed rate in messages per second
+        """
+        interval = self.interval()
+        return 1. / interval if interval else math.inf
+
+    def delay(self) -> float:
+        """
+        seconds to wait before the next message may be sent
+        """
+        return max(0., self._available_at - self.clock())
+
+    def can_send(self) -> bool:
+        return self._available_at <= self.clock()
+
+    def on_send(self) -> float:
+        """
+        take the next sending slot, returns seconds until the slot
+        """
+        now = self.clock()
+        interval = self.interval()
+        slot = max(self._available_at, now - (self.burst - 1) * interval)
+        self._available_at = slot + interval
+        self.sent += 1
+        return max(0., slot - now)
+
+    async def acquire(self) -> None:
+        """
+        take the next sending slot and wait for it
+        """
+        delay = self.on_send()
+        if delay:
+            self.waited += delay
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'level': self.level,
+            'rate': self.rate,
+            'throttled': self.throttled,
+            'stale': self.stale,
+            'sent': self.sent,
+            'waited': self.waited,
+        }
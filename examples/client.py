@@ -5,7 +5,7 @@ import logging
 import time
 
 from collections import namedtuple
-from cryptology import ClientWriterStub, run_client, exceptions
+from cryptology import ClientWriterStub, run_client, run_main, exceptions
 from datetime import datetime
 from decimal import Decimal
 from typing import Iterable, Dict, List
@@ -50,5 +50,4 @@ async def main():
 
 
 if __name__ == '__main__':
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(main())
+    run_main(main())
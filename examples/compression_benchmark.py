@@ -0,0 +1,107 @@
+"""
+record market data into a file and compare permessage-deflate settings on it
+
+    python compression_benchmark.py record market_data.jsonl --seconds 600
+    python compression_benchmark.py bench market_data.jsonl
+"""
+import argparse
+import asyncio
+import cryptology
+import json
+import logging
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import List, Tuple
+
+
+SERVER = os.getenv('SERVER', 'wss://marketdata.cryptology.com')
+NAME = Path(__file__).stem
+WINDOW_BITS = (0, 9, 10, 11, 12, 13, 14, 15)
+DEFLATE_TAIL = b'\x00\x00\xff\xff'
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(NAME)
+
+
+async def record(path: str, seconds: float) -> None:
+    stats = cryptology.WireStats()
+    with open(path, 'w') as f:
+        async def write_message(payload: dict) -> None:
+            f.write(json.dumps({'response_type': 'BROADCAST', 'data': payload}, separators=(',', ':')))
+            f.write('\n')
+
+        try:
+            await asyncio.wait_for(cryptology.run_market_data(
+                ws_addr=SERVER,
+                market_data_callback=write_message,
+                connection_options=cryptology.ConnectionOptions(compress=15),
+                wire_stats=stats
+            ), seconds)
+        except asyncio.TimeoutError:
+            pass
+    logger.info('recorded %i messages: %s', stats.messages, stats)
+
+
+def frame_header_size(size: int) -> int:
+    if size < 126:
+        return 2
+    if size < 1 << 16:
+        return 4
+    return 10
+
+
+def bench_window_bits(messages: List[bytes], window_bits: int) -> Tuple[int, float]:
+    """
+    emulate permessage-deflate with context takeover
+    returns bytes on the wire and time spent inflating and decoding json
+    """
+    wire_bytes = 0
+    elapsed = 0.
+    if window_bits:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -window_bits)
+        decompressor = zlib.decompressobj(-window_bits)
+    for message in messages:
+        if window_bits:
+            frame = compressor.compress(message) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            frame = frame[:-len(DEFLATE_TAIL)]
+        else:
+            frame = message
+        wire_bytes += frame_header_size(len(frame)) + len(frame)
+        started = time.perf_counter()
+        if window_bits:
+            data = decompressor.decompress(frame + DEFLATE_TAIL)
+        else:
+            data = frame
+        json.loads(data)
+        elapsed += time.perf_counter() - started
+    return wire_bytes, elapsed
+
+
+def bench(path: str) -> None:
+    with open(path, 'rb') as f:
+        messages = [line.rstrip(b'\n') for line in f if line.strip()]
+    decoded_bytes = sum(len(x) for x in messages)
+    print(f'{len(messages)} messages, {decoded_bytes} decoded bytes')
+    print(f'{"window bits":>12} {"wire bytes":>12} {"ratio":>8} {"decode, ms":>12} {"us/msg":>8}')
+    for window_bits in WINDOW_BITS:
+        wire_bytes, elapsed = bench_window_bits(messages, window_bits)
+        print(f'{window_bits or "off":>12} {wire_bytes:>12} {decoded_bytes / wire_bytes:>8.2f} '
+              f'{elapsed * 1000:>12.2f} {elapsed * 1e6 / max(len(messages), 1):>8.2f}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('record', 'bench'))
+    parser.add_argument('path')
+    parser.add_argument('--seconds', type=float, default=600)
+    args = parser.parse_args()
+    if args.command == 'record':
+        cryptology.run_main(record(args.path, args.seconds))
+    else:
+        bench(args.path)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,7 @@ import asyncio
 import os
 import logging
 
-from cryptology import ClientWriterStub, run_client, exceptions
+from cryptology import ClientWriterStub, run_client, run_main, exceptions
 from datetime import datetime
 from decimal import Decimal
 from typing import Dict, List
@@ -116,5 +116,4 @@ async def main():
 
 
 if __name__ == '__main__':
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(main())
+    run_main(main())
@@ -6,7 +6,6 @@ from aiohttp import WSServerHandshakeError
 from datetime import datetime
 from decimal import Decimal
 from pathlib import Path
-from typing import Optional
 
 
 SERVER = os.getenv('SERVER', 'wss://marketdata.cryptology.com')
@@ -22,18 +21,18 @@ async def read_order_book(order_id: int, pair: str, buy: dict, sell: dict) -> No
             logger.error('%s buy order book has size %i @ order %i', pair, len(buy), order_id)
         if len(sell) == 0:
             logger.error('%s sell order book has size %i @ order %i', pair, len(sell), order_id)
-        logger.info(f'order book @{order_id}')
-    logger.info(f'sell orders of {pair} @{order_id}: {sell}')
-    logger.info(f'buy orders of {pair} @{order_id}: {buy}')
+        logger.info('order book @%i', order_id)
+    logger.info('sell orders of %s @%i: %s', pair, order_id, sell)
+    logger.info('buy orders of %s @%i: %s', pair, order_id, buy)
 
 
 async def read_trades(ts: datetime, order_id: int, pair: str, amount: Decimal, price: Decimal) -> None:
-    currencies = pair.split("_")
-    logger.info(f'{ts}@{order_id} a buy of {amount} {currencies[0]} for {price} {currencies[1]} took place')
+    base, quoted = pair.split('_')
+    logger.info('%s@%i a buy of %s %s for %s %s took place', ts, order_id, amount, base, price, quoted)
 
 
-async def main(loop: Optional[asyncio.AbstractEventLoop] = None):
-    logger.info(f'connecting to {SERVER}')
+async def main():
+    logger.info('connecting to %s', SERVER)
 
     while True:
         try:
@@ -41,8 +40,7 @@ async def main(loop: Optional[asyncio.AbstractEventLoop] = None):
                 ws_addr=SERVER,
                 market_data_callback=None,
                 order_book_callback=read_order_book,
-                trades_callback=read_trades,
-                loop=loop
+                trades_callback=read_trades
             )
         except cryptology.exceptions.RateLimit:
             logger.error('rate limit reached')
@@ -55,5 +53,4 @@ async def main(loop: Optional[asyncio.AbstractEventLoop] = None):
 
 
 if __name__ == '__main__':
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(main(loop=loop))
+    cryptology.run_main(main(), use_uvloop=True)
@@ -3,8 +3,8 @@ import os
 
 from setuptools import setup
 
-if sys.version_info < (3, 6):
-    raise ImportError('cryptology-ws-client-python only supports python3.6 and newer')
+if sys.version_info < (3, 7):
+    raise ImportError('cryptology-ws-client-python only supports python3.7 and newer')
 
 base_dir = os.path.dirname(__file__)
 
@@ -19,16 +19,17 @@ setup(
     author='Cryptology',
     author_email='s.prikazchikov@cryptology.com',
     packages=['cryptology'],
-    python_requires='>= 3.6',
+    python_requires='>= 3.7',
     install_requires=[
         'aiodns',
-        'aiohttp >= 2.3.6',
+        'aiohttp >= 3.5',
         'cchardet',
     ],
     extras_require={
         'devel': ['pytz',
                   'pytest-aiohttp'
-                  ]
+                  ],
+        'uvloop': ['uvloop'],
     },
     url='https://github.com/CryptologyExchange/cryptology-ws-client-python',
     long_description_content_type='text/x-rst'
@@ -0,0 +1,124 @@
+import asyncio
+import pytest
+
+from aiohttp import WSMsgType, web
+from cryptology import client
+from cryptology.eventlog import EventLog
+from cryptology.instrumentation import StartupTimings
+from typing import Any, Callable, Dict, List
+
+
+ACCESS_KEY = 'access key'
+SECRET_KEY = 'secret key'
+TRADE_PAIRS = ['BTC_USD', 'ETH_USD']
+
+
+async def handler(request: web.Request) -> web.WebSocketResponse:
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    msg = await ws.receive()
+    if msg.type is WSMsgType.TEXT:
+        await welcome(ws, msg.json())
+    return ws
+
+
+async def welcome(ws: web.WebSocketResponse, auth: dict) -> None:
+    assert auth['access_key'] == ACCESS_KEY
+    await ws.send_json({'greeting': 'Welcome to Cryptology API Server', 'last_seen_sequence': 0, 'version': 7,
+                        'trade_pairs': TRADE_PAIRS})
+    await ws.send_json({'response_type': 'MESSAGE', 'timestamp': 1530000000, 'message_id': 1,
+                        'data': {'@type': 'SetBalance', 'currency': 'BTC', 'balance': '1'}})
+    await ws.receive()
+
+
+def idle_dropping_handler(server: Dict[str, Any]) -> Callable:
+    async def handler(request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        server['connections'] += 1
+        try:
+            msg = await ws.receive(timeout=server['idle_timeout'])
+        except asyncio.TimeoutError:
+            server['dropped'] += 1
+            await ws.close(code=1008)
+            return ws
+        if msg.type is not WSMsgType.TEXT:
+            return ws
+        if server['reject']:
+            server['reject'] -= 1
+            await ws.close(code=1008)
+            return ws
+        await welcome(ws, msg.json())
+        return ws
+    return handler
+
+
+async def run_once(ws_addr: str, access_key: str = ACCESS_KEY, **kwargs) -> List[dict]:
+    received = []
+    done = asyncio.Event()
+
+    async def read_callback(ws, ts, message_id: int, payload: dict) -> None:
+        received.append(payload)
+        done.set()
+
+    async def writer(ws, pairs: List[str], state: Dict) -> None:
+        assert pairs == TRADE_PAIRS
+        await done.wait()
+
+    await client.run_client(access_key=access_key, secret_key=SECRET_KEY, ws_addr=ws_addr,
+                            read_callback=read_callback, writer=writer, **kwargs)
+    return received
+
+
+@pytest.mark.asyncio
+async def test_standby_startup(ws_server, tmp_path) -> None:
+    ws_addr = await ws_server(handler)
+    cache = str(tmp_path / 'trade_pairs.json')
+    assert client.read_trade_pairs_cache(cache) is None
+
+    timings = StartupTimings()
+    event_log = EventLog()
+    assert len(await run_once(ws_addr, startup_timings=timings, event_log=event_log,
+                              trade_pairs_cache=cache)) == 1
+    assert [(event, args) for ts, event, args in event_log.events()] == [('receive', (1, 'SetBalance'))]
+    assert {'session', 'connection', 'connect', 'authenticate'} <= set(timings.phases)
+    assert client.read_trade_pairs_cache(cache) == TRADE_PAIRS
+
+    async with client.StandbyConnections(access_key=ACCESS_KEY, secret_key=SECRET_KEY, ws_addr=ws_addr,
+                                         size=2) as standby:
+        await asyncio.sleep(.1)
+        assert standby.ready == 2
+        timings = StartupTimings()
+        assert len(await run_once(ws_addr, standby=standby, startup_timings=timings)) == 1
+        assert set(timings.phases) == {'standby_connect', 'connect', 'authenticate'}
+        await asyncio.sleep(.1)
+        assert standby.ready == 2
+
+        with pytest.raises(ValueError):
+            await run_once(ws_addr, standby=standby, access_key='other key')
+
+
+@pytest.mark.asyncio
+async def test_standby_dropped(ws_server) -> None:
+    server = {'connections': 0, 'dropped': 0, 'idle_timeout': .05, 'reject': 0}
+    ws_addr = await ws_server(idle_dropping_handler(server))
+
+    async with client.StandbyConnections(access_key=ACCESS_KEY, secret_key=SECRET_KEY,
+                                         ws_addr=ws_addr) as standby:
+        await asyncio.sleep(.3)
+        assert server['dropped'] >= 2
+        assert server['connections'] > server['dropped']
+
+        server['idle_timeout'] = None
+        await asyncio.sleep(.1)
+        assert standby.ready == 1
+        server['reject'] = 1
+        assert len(await run_once(ws_addr, standby=standby)) == 1
+        assert server['reject'] == 0
+
+    server['connections'] = 0
+    async with client.StandbyConnections(access_key=ACCESS_KEY, secret_key=SECRET_KEY, ws_addr=ws_addr,
+                                         max_idle=.05) as standby:
+        await asyncio.sleep(.3)
+        assert standby.ready == 1
+        assert server['connections'] >= 3
@@ -0,0 +1,40 @@
+import aiohttp
+import pytest
+import socket
+
+from aiohttp import web
+from cryptology import common
+
+
+async def handler(request: web.Request) -> web.WebSocketResponse:
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    await ws.receive()
+    return ws
+
+
+@pytest.mark.asyncio
+async def test_tune_socket(ws_server) -> None:
+    ws_addr = await ws_server(handler)
+    async with aiohttp.ClientSession() as session:
+        async with session.ws_connect(ws_addr) as ws:
+            sock = ws.get_extra_info('socket')
+
+            common.tune_socket(ws, common.ConnectionOptions(tcp_nodelay=False))
+            assert not sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+
+            common.tune_socket(ws, common.ConnectionOptions(tcp_nodelay=True, receive_buffer_size=8192))
+            assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+            # linux reports twice the requested size
+            assert 8192 <= sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) <= 2 * 8192
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not common.SOCKET_FACTORY_SUPPORTED, reason='aiohttp has no socket_factory')
+async def test_buffer_sizes_before_connect(ws_server) -> None:
+    ws_addr = await ws_server(handler)
+    options = common.ConnectionOptions(receive_buffer_size=8192)
+    async with aiohttp.ClientSession(connector=common.make_connector(options)) as session:
+        async with session.ws_connect(ws_addr) as ws:
+            sock = ws.get_extra_info('socket')
+            assert 8192 <= sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) <= 2 * 8192
@@ -0,0 +1,45 @@
+import pytest_asyncio
+
+from aiohttp import web
+from typing import AsyncIterator, Awaitable, Callable
+
+Handler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+StartServer = Callable[[Handler], Awaitable[str]]
+
+
+def trade(order_id: int, trade_pair: str = 'BTC_USD', time: float = 1530000000) -> dict:
+    return {
+        '@type': 'AnonymousTrade',
+        'time': [time, 0],
+        'current_order_id': order_id,
+        'trade_pair': trade_pair,
+        'amount': '0.1',
+        'price': '6500.00',
+    }
+
+
+def broadcast(payload: dict) -> dict:
+    return {'response_type': 'BROADCAST', 'data': payload}
+
+
+@pytest_asyncio.fixture
+async def ws_server() -> AsyncIterator[StartServer]:
+    """
+    starts local servers with a websocket `handler` at `/`, returns the websocket address
+    servers are stopped at the end of the test
+    """
+    runners = []
+
+    async def start(handler: Handler) -> str:
+        app = web.Application()
+        app.router.add_get('/', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        runners.append(runner)
+        await web.TCPSite(runner, '127.0.0.1', 0).start()
+        host, port = runner.addresses[0][:2]
+        return f'ws://{host}:{port}/'
+
+    yield start
+    for runner in runners:
+        await runner.cleanup()
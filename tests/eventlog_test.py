@@ -0,0 +1,37 @@
+import logging
+import pytest
+
+from cryptology.eventlog import EventLog
+
+
+def test_ring_buffer() -> None:
+    event_log = EventLog(capacity=3)
+    for n in range(5):
+        event_log.record('receive', n)
+
+    assert event_log.recorded == 5
+    assert [args for ts, event, args in event_log.events()] == [(2,), (3,), (4,)]
+
+
+def test_sampling() -> None:
+    event_log = EventLog(sample_every=10)
+    for n in range(1, 31):
+        event_log.record('send', n, {'@type': 'CancelOrder'})
+
+    assert [args[0] for ts, event, args in event_log.events()] == [10, 20, 30]
+
+    with pytest.raises(ValueError):
+        EventLog(sample_every=0)
+
+
+def test_dump(caplog: pytest.LogCaptureFixture) -> None:
+    logger = logging.getLogger('eventlog_test')
+    event_log = EventLog()
+    event_log.record('send', 1, {'@type': 'CancelOrder', 'order_id': 42})
+
+    with caplog.at_level(logging.ERROR, logger='eventlog_test'):
+        event_log.dump(logger)
+        event_log.dump(logger, logging.DEBUG)
+
+    assert len(caplog.records) == 1
+    assert "send 1 {'@type': 'CancelOrder', 'order_id': 42}" in caplog.text
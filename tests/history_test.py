@@ -0,0 +1,71 @@
+from cryptology.history import MessageHistory, SpillFile
+from datetime import datetime
+
+
+def message(message_id: int) -> dict:
+    return {'@type': 'BuyOrderPlaced' if message_id % 2 else 'SetBalance', 'order_id': message_id // 4}
+
+
+def ids(entries) -> list:
+    return [x.message_id for x in entries]
+
+
+def test_ring_buffer() -> None:
+    history = MessageHistory(capacity=10)
+    for message_id in range(1, 26):
+        history.append(message_id, datetime(2018, 1, 1), message(message_id))
+
+    assert len(history) == 10
+    assert history.last_message_id == 25
+    assert history.get(15) is None
+    assert history.get(16).payload == message(16)
+    assert ids(history.range(10, 20)) == [16, 17, 18, 19]
+    assert ids(history.range(22)) == [22, 23, 24, 25]
+    assert ids(history.by_order_id(4)) == [16, 17, 18, 19]
+    assert ids(history.by_order_id(3)) == []
+    assert ids(history.by_type('SetBalance')) == [16, 18, 20, 22, 24]
+
+
+def test_spill_file(tmp_path) -> None:
+    path = str(tmp_path / 'history')
+    ts = datetime(2018, 1, 1, 12, 30)
+    history = MessageHistory(capacity=10, spill_path=path, spill_size=4096)
+    for message_id in range(1, 201):
+        history.append(message_id, ts, message(message_id))
+
+    assert ids(history.range(185, 195)) == list(range(185, 195))
+    oldest = history._spill.first_id
+    assert 1 < oldest < 150
+    assert history.get(oldest - 1) is None
+    assert history.get(oldest) == (oldest, ts, message(oldest))
+    history.close()
+
+    restored = MessageHistory(capacity=10, spill_path=path, spill_size=4096)
+    assert len(restored) == 0
+    assert restored.last_message_id == 200
+    assert ids(restored.range(195)) == list(range(195, 201))
+    restored.append(201, ts, message(201))
+    assert ids(restored.range(198)) == [198, 199, 200, 201]
+    restored.close()
+
+
+def test_spill_file_wraps(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(SpillFile, 'COMPACT_AFTER', 8)
+    path = str(tmp_path / 'history')
+    ts = datetime(2018, 1, 1)
+    spill = SpillFile(path, 1024)
+    for message_id in range(1, 1001):
+        spill.append(message_id, 1514764800., message(message_id))
+        assert spill.end - spill.start <= spill.capacity
+
+    assert spill.last_id == 1000
+    assert len(spill) == 1000 - spill.first_id + 1
+    assert [x.message_id for x in spill.range(990)] == list(range(990, 1001))
+    assert spill.get(spill.first_id) == (spill.first_id, ts, message(spill.first_id))
+    assert spill.get(spill.first_id - 1) is None
+    first_id = spill.first_id
+    spill.close()
+
+    restored = SpillFile(path, 1024)
+    assert (restored.first_id, restored.last_id) == (first_id, 1000)
+    restored.close()
@@ -0,0 +1,77 @@
+import aiohttp
+import asyncio
+import json
+import pytest
+
+from aiohttp import web
+from conftest import StartServer, broadcast, trade
+from cryptology import common, exceptions, market_data_client
+from cryptology.instrumentation import WireStats, instrument
+from types import SimpleNamespace
+
+
+async def handler(request: web.Request) -> web.WebSocketResponse:
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    await asyncio.sleep(.05)
+    for order_id in range(100):
+        await ws.send_json(broadcast(trade(order_id)))
+    await ws.close(code=1012)
+    return ws
+
+
+async def receive_all(ws_server: StartServer, compress: int) -> WireStats:
+    ws_addr = await ws_server(handler)
+    stats = WireStats()
+    trades = []
+
+    async def trades_callback(*args) -> None:
+        trades.append(args)
+
+    with pytest.raises(exceptions.ServerRestart):
+        await market_data_client.run(ws_addr=ws_addr, trades_callback=trades_callback,
+                                     connection_options=common.ConnectionOptions(compress=compress),
+                                     wire_stats=stats)
+    await asyncio.sleep(0)
+    assert len(trades) == 100
+    return stats
+
+
+@pytest.mark.asyncio
+async def test_wire_stats(ws_server) -> None:
+    plain = await receive_all(ws_server, 0)
+    deflated = await receive_all(ws_server, 15)
+
+    assert plain.messages == deflated.messages == 100
+    assert plain.decoded_bytes == deflated.decoded_bytes
+    assert plain.wire_bytes > plain.decoded_bytes
+    assert deflated.wire_bytes < plain.wire_bytes
+    assert deflated.compression_ratio > 1
+    assert deflated.parse_time > 0
+
+
+class OtherTransport:
+    pass
+
+
+def test_instrument_other_transport() -> None:
+    def data_received(data: bytes) -> None:
+        pass
+
+    protocol = SimpleNamespace(transport=OtherTransport(), data_received=data_received)
+    ws = SimpleNamespace(_response=SimpleNamespace(connection=SimpleNamespace(protocol=protocol)))
+    assert not instrument(ws, WireStats())
+    assert protocol.data_received is data_received
+
+
+@pytest.mark.asyncio
+async def test_decoded_bytes() -> None:
+    payload = {'trade_pair': 'BTC_EUR', 'currency': '\u20ac'}
+
+    class FakeWebSocket:
+        async def receive(self, timeout=None) -> aiohttp.WSMessage:
+            return aiohttp.WSMessage(aiohttp.WSMsgType.TEXT, json.dumps(payload, ensure_ascii=False), None)
+
+    stats = WireStats()
+    assert await common.receive_msg(FakeWebSocket(), wire_stats=stats) == payload
+    assert stats.decoded_bytes == len(json.dumps(payload, ensure_ascii=False).encode())
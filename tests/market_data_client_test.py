@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import pytest
+
+from aiohttp import web
+from conftest import broadcast, trade
+from cryptology import exceptions, market_data_client
+from cryptology.eventlog import EventLog
+from cryptology.market_data_client import BroadcastDeduplicator
+from typing import Callable, List
+
+
+def test_deduplicator() -> None:
+    deduplicator = BroadcastDeduplicator()
+    first, second = deduplicator.source(), deduplicator.source()
+
+    assert first.is_new(trade(1))
+    assert not second.is_new(trade(1))
+    assert first.is_new(trade(1))
+    assert not second.is_new(trade(1))
+    assert second.is_new(trade(2))
+    assert second.is_new(trade(1, 'ETH_USD'))
+    assert not first.is_new(trade(2))
+    assert not first.is_new(trade(1, 'ETH_USD'))
+    assert first.is_new({**trade(2), '@type': 'OrderBookAgg'})
+
+
+def broadcast_handler(order_ids: List[int], delay: float, close_code: int) -> Callable:
+    async def handler(request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        for order_id in order_ids:
+            await ws.send_json(broadcast(trade(order_id)))
+            await asyncio.sleep(delay)
+        await ws.close(code=close_code)
+        return ws
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_run_redundant_failover(ws_server) -> None:
+    addrs = [await ws_server(broadcast_handler(list(range(50)), 0, 1012)),
+             await ws_server(broadcast_handler(list(range(100)), .001, 1012))]
+    order_ids = []
+
+    async def trades_callback(ts, order_id, pair, amount, price) -> None:
+        order_ids.append(order_id)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(market_data_client.run_redundant(
+            ws_addr=addrs, trades_callback=trades_callback, reconnect_delay=10), .5)
+    assert order_ids == list(range(100))
+
+
+@pytest.mark.asyncio
+async def test_run_redundant_connections() -> None:
+    with pytest.raises(ValueError):
+        await market_data_client.run_redundant(ws_addr='ws://127.0.0.1:1/', connections=0)
+    with pytest.raises(ValueError):
+        await market_data_client.run_redundant(ws_addr=[])
+    with pytest.raises(ValueError):
+        await market_data_client.run_redundant(ws_addr=['ws://127.0.0.1:1/'], connections=2)
+
+
+@pytest.mark.asyncio
+async def test_event_log_dumped_on_disconnect(ws_server, caplog: pytest.LogCaptureFixture) -> None:
+    ws_addr = await ws_server(broadcast_handler([1, 2, 3], 0, 1012))
+    event_log = EventLog()
+    with caplog.at_level(logging.ERROR, logger=market_data_client.logger.name):
+        with pytest.raises(exceptions.ServerRestart):
+            await market_data_client.run(ws_addr=ws_addr, event_log=event_log)
+    assert "broadcast 'AnonymousTrade' 'BTC_USD' 3" in caplog.text
+
+    caplog.clear()
+    ws_addr = await ws_server(broadcast_handler([4], 0, 4100))
+    with caplog.at_level(logging.ERROR, logger=market_data_client.logger.name):
+        with pytest.raises(exceptions.InvalidKey):
+            await market_data_client.run_redundant(ws_addr=ws_addr, event_log=event_log)
+    assert "broadcast 'AnonymousTrade' 'BTC_USD' 4" in caplog.text
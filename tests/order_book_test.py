@@ -0,0 +1,62 @@
+import pytest
+
+from cryptology.order_book import OrderBookDiffer, OrderBookEvents
+
+
+def test_differ() -> None:
+    differ = OrderBookDiffer(depth=2)
+
+    buy, sell = differ.update('BTC_USD', {'9.5': '1', '10': '2', '8': '3'}, {'11': '1'})
+    assert buy == {'10': '2', '9.5': '1'}
+    assert sell == {'11': '1'}
+    assert differ.best('BTC_USD') == (('10', '2'), ('11', '1'))
+
+    assert differ.update('BTC_USD', {'9.5': '1', '10': '2', '7': '5'}, {'11': '1'}) == ({}, {})
+
+    buy, sell = differ.update('BTC_USD', {'9.5': '4', '10.5': '1', '10': '2'}, {})
+    assert buy == {'10.5': '1', '9.5': None}
+    assert sell == {'11': None}
+    assert differ.best('BTC_USD') == (('10.5', '1'), None)
+
+    differ.forget('BTC_USD')
+    assert differ.best('BTC_USD') == (None, None)
+
+
+def test_differ_in_place_book() -> None:
+    differ = OrderBookDiffer(depth=5)
+    book = {'9': '1'}
+    differ.update('BTC_USD', book, {})
+    book['10'] = '7'
+    assert differ.update('BTC_USD', book, {}) == ({'10': '7'}, {})
+
+
+def test_differ_decimal_prices() -> None:
+    differ = OrderBookDiffer()
+    differ.update('BTC_USD', {'0.1': '1', '0.10000000000000000001': '2'}, {})
+    assert differ.best('BTC_USD') == (('0.10000000000000000001', '2'), None)
+
+
+@pytest.mark.asyncio
+async def test_events() -> None:
+    tops = []
+    deltas = []
+
+    async def top_of_book_callback(order_id, trade_pair, bid, ask) -> None:
+        tops.append((order_id, bid, ask))
+
+    async def level_delta_callback(order_id, trade_pair, buy, sell) -> None:
+        deltas.append((order_id, buy, sell))
+
+    events = OrderBookEvents(top_of_book_callback=top_of_book_callback, level_delta_callback=level_delta_callback,
+                             depth=2)
+    await events(1, 'BTC_USD', {'10': '1', '9': '1', '8': '1'}, {'11': '1'})
+    await events(2, 'BTC_USD', {'10': '1', '9': '1', '8': '2'}, {'11': '1'})
+    await events(3, 'BTC_USD', {'10': '1', '9': '3'}, {'11': '1'})
+    await events(4, 'BTC_USD', {'10': '1', '9': '3'}, {'11': '2'})
+
+    assert tops == [(1, ('10', '1'), ('11', '1')), (4, ('10', '1'), ('11', '2'))]
+    assert deltas == [
+        (1, {'10': '1', '9': '1'}, {'11': '1'}),
+        (3, {'9': '3'}, {}),
+        (4, {}, {'11': '2'}),
+    ]
@@ -1,13 +1,12 @@
 import asyncio
 import pytest
 
-from cryptology.parallel import run_parallel
+from cryptology.parallel import Child, Restart, TaskGroup, run_parallel, run_supervised
 from typing import Optional
 
 
-async def target(sleep: float, exception: Optional[Exception] = None,
-                 loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
-    await asyncio.sleep(sleep, loop=loop)
+async def target(sleep: float, exception: Optional[Exception] = None) -> None:
+    await asyncio.sleep(sleep)
     if exception:
         raise exception
 
@@ -21,13 +20,90 @@ class BarError(Exception):
 
 
 @pytest.mark.asyncio
-async def test_exit(event_loop: asyncio.AbstractEventLoop) -> None:
-    await run_parallel([target(.1, loop=event_loop), target(.2, loop=event_loop)], loop=event_loop)
+async def test_exit() -> None:
+    await run_parallel([target(.1), target(.2)])
 
     with pytest.raises(FooError):
-        await run_parallel([target(.1, FooError(), loop=event_loop), target(.2, BarError(), loop=event_loop)],
-                           loop=event_loop)
+        await run_parallel([target(.1, FooError()), target(.2, BarError())])
 
     with pytest.raises(asyncio.CancelledError):
-        await run_parallel([target(.1, loop=event_loop), target(.2, loop=event_loop)],
-                           raise_canceled=True, loop=event_loop)
+        await run_parallel([target(.1), target(.2)], raise_canceled=True)
+
+
+@pytest.mark.asyncio
+async def test_task_group() -> None:
+    tasks = TaskGroup(max_pending=2)
+    tasks.spawn(target(0))
+    tasks.spawn(target(0, FooError()))
+    tasks.spawn(target(10))
+    tasks.spawn(target(10)).cancel()
+    assert tasks.pending == 4
+
+    assert await tasks.drain(.1) == 1
+    assert tasks.stats() == {'pending': 0, 'spawned': 4, 'failed': 1, 'cancelled': 1, 'leaked': 1,
+                             'overruns': 2, 'peak_pending': 4}
+
+
+@pytest.mark.asyncio
+async def test_restart() -> None:
+    calls = []
+
+    async def flaky() -> None:
+        calls.append(None)
+        if len(calls) < 3:
+            raise FooError()
+
+    await run_supervised([Child(flaky, restart=Restart.ON_FAILURE, restart_delay=0)])
+    assert len(calls) == 3
+
+    calls.clear()
+    with pytest.raises(FooError):
+        await run_supervised([Child(flaky, restart=Restart.ON_FAILURE, max_restarts=1, restart_delay=0)])
+    assert len(calls) == 2
+
+    calls.clear()
+    with pytest.raises(FooError):
+        await run_supervised([Child(flaky, restart=Restart.ALWAYS, restart_on=(BarError,), restart_delay=0)])
+    assert len(calls) == 1
+
+    calls.clear()
+    await run_supervised([Child(flaky, restart=Restart.ALWAYS, max_restarts=4, restart_delay=0)])
+    assert len(calls) == 5
+
+
+@pytest.mark.asyncio
+async def test_restart_backoff(monkeypatch) -> None:
+    delays = []
+    sleep = asyncio.sleep
+
+    async def record_sleep(delay: float) -> None:
+        delays.append(delay)
+        await sleep(0)
+
+    async def failing() -> None:
+        raise FooError()
+
+    monkeypatch.setattr(asyncio, 'sleep', record_sleep)
+    with pytest.raises(FooError):
+        await run_supervised([Child(failing, restart=Restart.ON_FAILURE, max_restarts=5,
+                                    restart_delay=1, backoff=2, max_restart_delay=5)])
+    assert delays == [1, 2, 4, 5, 5]
+
+    delays.clear()
+    with pytest.raises(FooError):
+        await run_supervised([Child(failing, restart=Restart.ON_FAILURE, max_restarts=3,
+                                    restart_delay=1, backoff=2, reset_after=0)])
+    assert delays == [1, 1, 1]
+
+
+@pytest.mark.asyncio
+async def test_run_supervised_drains_tasks() -> None:
+    tasks = TaskGroup()
+
+    async def spawner() -> None:
+        tasks.spawn(target(.05))
+        tasks.spawn(target(10))
+
+    await run_supervised([spawner()], tasks=tasks, drain_timeout=.1)
+    assert tasks.pending == 0
+    assert tasks.leaked == 1
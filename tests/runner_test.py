@@ -0,0 +1,52 @@
+import asyncio
+import sys
+
+from types import SimpleNamespace
+
+from cryptology import runner
+
+
+def test_run_cancels_leftover_tasks() -> None:
+    cancelled = []
+    loops = []
+
+    async def background() -> None:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(None)
+            raise
+
+    async def main() -> int:
+        loops.append(asyncio.get_event_loop())
+        asyncio.ensure_future(background())
+        await asyncio.sleep(0)
+        return 42
+
+    assert runner.run(main()) == 42
+    assert cancelled == [None]
+    assert loops[0].is_closed()
+
+
+def test_install_uvloop_missing(monkeypatch) -> None:
+    monkeypatch.setitem(sys.modules, 'uvloop', None)
+    policy = asyncio.get_event_loop_policy()
+    assert runner.install_uvloop() is False
+    assert asyncio.get_event_loop_policy() is policy
+
+
+def test_run_uvloop_keeps_policy(monkeypatch) -> None:
+    loops = []
+
+    def new_event_loop() -> asyncio.AbstractEventLoop:
+        loop = asyncio.new_event_loop()
+        loops.append(loop)
+        return loop
+
+    async def main() -> asyncio.AbstractEventLoop:
+        return asyncio.get_event_loop()
+
+    monkeypatch.setitem(sys.modules, 'uvloop', SimpleNamespace(new_event_loop=new_event_loop))
+    policy = asyncio.get_event_loop_policy()
+    assert runner.run(main(), use_uvloop=True) is loops[0]
+    assert asyncio.get_event_loop_policy() is policy
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import time
+
+from conftest import broadcast, trade
+from cryptology.simulation import VirtualClock, read_recording, replay_client, replay_market_data, simulate
+from datetime import datetime
+from typing import Dict, List
+
+START = 1530000000.
+
+
+def test_replay_market_data() -> None:
+    trades = []
+    ticks = []
+    clock = VirtualClock()
+
+    async def trades_callback(ts: datetime, order_id: int, pair: str, amount, price) -> None:
+        trades.append((ts, clock.datetime))
+
+    async def ticker() -> None:
+        while True:
+            await asyncio.sleep(60)
+            ticks.append(clock.now)
+
+    async def main() -> None:
+        task = asyncio.ensure_future(ticker())
+        await replay_market_data(((START + n * 3600, broadcast(trade(n, time=START + n * 3600))) for n in range(24)), trades_callback=trades_callback)
+        task.cancel()
+
+    started = time.monotonic()
+    simulate(main(), clock=clock)
+
+    assert time.monotonic() - started < 5
+    assert len(trades) == 24
+    assert all(ts == now for ts, now in trades)
+    assert clock.now == START + 23 * 3600
+    assert len(ticks) == 23 * 60
+
+
+def test_replay_client() -> None:
+    received = []
+
+    async def read_callback(ws, ts: datetime, message_id: int, payload: dict) -> None:
+        received.append((ts, message_id, payload['@type']))
+        if payload['@type'] == 'BuyOrderPlaced':
+            await ws.send_message(payload={'@type': 'CancelOrder', 'order_id': payload['order_id']})
+
+    async def writer(ws, pairs: List[str], state: Dict) -> None:
+        for _ in range(3):
+            await ws.send_message(payload={'@type': 'PlaceBuyLimitOrder', 'trade_pair': 'BTC_USD',
+                                           'price': '1', 'amount': '1'})
+            await asyncio.sleep(10)
+
+    messages = [(START, 7, {'@type': 'SetBalance', 'currency': 'BTC', 'balance': '1'}),
+                (START + 25, 8, {'@type': 'SetBalance', 'currency': 'BTC', 'balance': '2'})]
+    ws = simulate(replay_client(messages, read_callback=read_callback, writer=writer, latency=.5))
+
+    assert [x[1:] for x in received] == [
+        (7, 'SetBalance'), (-1, 'BuyOrderPlaced'), (-2, 'BuyOrderCancelled'),
+        (-3, 'BuyOrderPlaced'), (-4, 'BuyOrderCancelled'),
+        (-5, 'BuyOrderPlaced'), (-6, 'BuyOrderCancelled'),
+        (8, 'SetBalance'),
+    ]
+    assert received[1][0] == datetime.utcfromtimestamp(START + .5)
+    assert received[4][0] == datetime.utcfromtimestamp(START + 11)
+    assert len(ws.sent) == 6
+    assert ws.open_orders == {}
+
+
+def test_replay_client_recording(tmp_path) -> None:
+    frames = [
+        {'response_type': 'MESSAGE', 'timestamp': START, 'message_id': 7,
+         'data': {'@type': 'SetBalance', 'currency': 'BTC', 'balance': '1'}},
+        {'response_type': 'THROTTLING', 'overflow_level': 1, 'sequence_id': 3},
+        {'response_type': 'MESSAGE', 'timestamp': START + 30, 'message_id': 8,
+         'data': {'@type': 'SetBalance', 'currency': 'BTC', 'balance': '2'}},
+    ]
+    path = tmp_path / 'recording.jsonl'
+    path.write_text(''.join(json.dumps(frame) + '\n' for frame in frames))
+    received = []
+
+    async def read_callback(ws, ts: datetime, message_id: int, payload: dict) -> None:
+        received.append((ts, message_id, payload['balance']))
+
+    async def writer(ws, pairs: List[str], state: Dict) -> None:
+        await asyncio.sleep(3600)
+
+    clock = VirtualClock()
+    simulate(replay_client(read_recording(str(path)), read_callback=read_callback, writer=writer), clock=clock)
+
+    assert received == [(datetime.utcfromtimestamp(START), 7, '1'),
+                        (datetime.utcfromtimestamp(START + 30), 8, '2')]
+    assert clock.now == START + 30
+
+
+def test_simulate_cancels_leftover_tasks() -> None:
+    cancelled = []
+
+    async def background() -> None:
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            cancelled.append(asyncio.get_event_loop().time())
+            raise
+
+    async def main() -> None:
+        asyncio.ensure_future(background())
+        await asyncio.sleep(60)
+
+    simulate(main(), clock=VirtualClock(START))
+    assert len(cancelled) == 1
+    assert abs(cancelled[0] - (START + 60)) < .001
@@ -0,0 +1,77 @@
+import asyncio
+import itertools
+import pytest
+
+from aiohttp import web
+from conftest import broadcast, trade
+from cryptology.eventlog import EventLog
+from cryptology.instrumentation import WireStats
+from cryptology.subscriptions import SubscriptionManager
+from typing import Dict, List, Set
+
+
+@pytest.mark.asyncio
+async def test_subscriptions(ws_server) -> None:
+    subscriptions: List[Set[str]] = []
+    sockets: Dict[web.WebSocketResponse, Set[str]] = {}
+
+    async def handler(request: web.Request) -> web.WebSocketResponse:
+        pairs = set(request.query.getall('trade_pair'))
+        subscriptions.append(pairs)
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        sockets[ws] = pairs
+        try:
+            await ws.receive()
+        finally:
+            del sockets[ws]
+        return ws
+
+    async def exchange() -> None:
+        for order_id in itertools.count():
+            for ws, pairs in list(sockets.items()):
+                for pair in sorted(pairs):
+                    await ws.send_json(broadcast(trade(order_id, pair)))
+            await asyncio.sleep(.005)
+
+    ws_addr = await ws_server(handler)
+
+    received = {}
+
+    async def trades_callback(ts, order_id, pair, amount, price) -> None:
+        received.setdefault(pair, []).append(order_id)
+
+    wire_stats = WireStats()
+    event_log = EventLog()
+    manager = SubscriptionManager(ws_addr=ws_addr, trade_pairs=['BTC_USD'], pairs_per_connection=2,
+                                  trades_callback=trades_callback, wire_stats=wire_stats, event_log=event_log)
+    task = asyncio.ensure_future(manager.run())
+    exchange_task = asyncio.ensure_future(exchange())
+    try:
+        await asyncio.sleep(.1)
+        manager.add('ETH_USD', 'LTC_USD')
+        assert manager.connections == [frozenset({'BTC_USD', 'ETH_USD'}), frozenset({'LTC_USD'})]
+        await asyncio.sleep(.1)
+        manager.remove('BTC_USD')
+        await asyncio.sleep(0)
+        removed_at = len(received['BTC_USD'])
+        await asyncio.sleep(.1)
+        assert len(received['BTC_USD']) == removed_at
+        manager.rebalance()
+        assert manager.connections == [frozenset({'ETH_USD', 'LTC_USD'})]
+        await asyncio.sleep(.1)
+        assert len(sockets) == 1
+    finally:
+        task.cancel()
+        exchange_task.cancel()
+        await asyncio.gather(task, exchange_task, return_exceptions=True)
+
+    assert subscriptions == [{'BTC_USD'}, {'BTC_USD', 'ETH_USD'}, {'LTC_USD'}, {'ETH_USD'}, {'ETH_USD', 'LTC_USD'}]
+    assert wire_stats.messages >= sum(map(len, received.values()))
+    assert event_log.recorded == wire_stats.messages
+    for order_ids_of_pair in received.values():
+        assert order_ids_of_pair == sorted(set(order_ids_of_pair))
+    btc = received['BTC_USD']
+    assert btc == list(range(btc[0], btc[0] + len(btc)))
+    eth = received['ETH_USD']
+    assert eth == list(range(eth[0], eth[0] + len(eth)))
@@ -0,0 +1,67 @@
+import math
+import pytest
+
+from cryptology.throttling import ThrottlingController
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 100.
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_unthrottled() -> None:
+    controller = ThrottlingController(clock=Clock())
+    assert controller.rate == math.inf
+    for _ in range(10):
+        assert controller.on_send() == 0
+    assert controller.can_send()
+
+
+def test_throttling_decays() -> None:
+    clock = Clock()
+    controller = ThrottlingController(max_rate=100, half_life=2., clock=clock)
+    assert controller.rate == pytest.approx(100)
+
+    controller.on_throttling(40)
+    assert controller.interval() == pytest.approx(.05)
+    controller.on_throttling(10)
+    assert controller.level == pytest.approx(40)
+
+    clock.now += 2
+    assert controller.level == pytest.approx(20)
+    assert controller.rate == pytest.approx(1 / .03)
+
+    clock.now += 60
+    assert controller.rate == pytest.approx(100, rel=1e-3)
+    assert controller.throttled == 2
+
+
+def test_pacing() -> None:
+    clock = Clock()
+    controller = ThrottlingController(max_rate=10, burst=3, clock=clock)
+
+    assert [controller.on_send() for _ in range(5)] == pytest.approx([0, 0, 0, .1, .2])
+    assert not controller.can_send()
+    assert controller.delay() == pytest.approx(.3)
+
+    clock.now += .3
+    assert controller.can_send()
+    assert controller.on_send() == 0
+    assert controller.delay() == pytest.approx(.1)
+
+    clock.now += 10
+    assert [controller.on_send() for _ in range(4)] == pytest.approx([0, 0, 0, .1])
+
+
+def test_stale_throttling() -> None:
+    controller = ThrottlingController(max_rate=100, clock=Clock())
+    controller.on_throttling(10, sequence_id=5)
+    controller.on_throttling(40, sequence_id=3)
+    assert controller.level == pytest.approx(10)
+    controller.on_throttling(20, sequence_id=5)
+    assert controller.level == pytest.approx(20)
+    assert controller.throttled == 2
+    assert controller.stale == 1